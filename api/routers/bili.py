@@ -30,7 +30,9 @@ async def search_videos(keyword: str, page: int = 1, page_size: int = 20):
     if not video_processor:
         raise HTTPException(status_code=400, detail="服务未初始化")
     try:
-        return await video_processor.downloader.search_videos(keyword, Platform.BILIBILI, page_size)
+        # 前面的页来自搜索缓存,翻页时只请求新增的页
+        videos = await video_processor.downloader.search_videos(keyword, Platform.BILIBILI, page * page_size)
+        return videos[(page - 1) * page_size:page * page_size]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -42,7 +42,8 @@ async def search_videos(keyword: str, page: int = 1, page_size: int = 20):
     """搜索YouTube视频"""
     if not video_processor:
         raise HTTPException(status_code=400, detail="服务未初始化")
-    return await video_processor.search_videos(keyword, page_size)
+    videos = await video_processor.downloader.search_videos(keyword, Platform.YOUTUBE, page * page_size)
+    return videos[(page - 1) * page_size:page * page_size]
 
 
 @router.post("/video/{video_id}")
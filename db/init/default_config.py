@@ -52,6 +52,10 @@ DEFAULT_CONFIGS = {
             "cookie_data": {
                 "value": {},
                 "description": "YouTube下载时的cookies"
+            },
+            "info_cache_ttl": {
+                "value": 1800,
+                "description": "视频信息缓存时间(秒),同一视频的元数据、字幕和音频下载共用一次信息提取;格式地址会过期,不宜超过数小时,0表示不缓存"
             }
         }
     },
@@ -87,6 +91,10 @@ DEFAULT_CONFIGS = {
             "buvid3": {
                 "value": "",
                 "description": "B站登录凭证buvid3"
+            },
+            "wbi_key_ttl": {
+                "value": 21600,
+                "description": "WBI签名密钥有效期(秒),用到80%时在后台刷新"
             }
         }
     },
@@ -103,9 +111,99 @@ DEFAULT_CONFIGS = {
                 "value": "zh",
                 "description": "识别的目标语言"
             },
+            "engine": {
+                "value": "openai",
+                "description": "推理引擎,可选:openai(原生PyTorch)/int8(CPU动态int8量化)/faster_whisper(CTranslate2,需安装faster-whisper)"
+            },
             "prompt": {
                 "value": "",
                 "description": "识别提示词"
+            },
+            "language_detection": {
+                "value": False,
+                "description": "转录前用小模型识别音频前30秒的语言,按识别结果选择语言、提示词和模型"
+            },
+            "language_detect_model": {
+                "value": "tiny",
+                "description": "语言识别使用的模型(须为多语言模型)"
+            },
+            "language_min_prob": {
+                "value": 0.5,
+                "description": "语言识别置信度低于该值时使用 whisper.language 配置的语言"
+            },
+            "language_profiles": {
+                "value": {
+                    "en": {"prompt": "", "model_name": ""}
+                },
+                "description": "按识别出的语言覆盖提示词和模型。未配置prompt时,识别语言与 whisper.language 相同则沿用 whisper.prompt,否则不使用提示词;model_name留空则使用 whisper.model_name,英文可设为 base.en 等纯英文模型"
+            },
+            "long_audio_threshold": {
+                "value": 1200,
+                "description": "超过该时长(秒)的音频启用分块并行转录,0表示关闭"
+            },
+            "chunk_duration": {
+                "value": 600,
+                "description": "长音频分块并行转录时每块的目标时长(秒)"
+            },
+            "model_cache_budget_mb": {
+                "value": 4096,
+                "description": "常驻内存的Whisper模型缓存预算(MB),超出时按最近最少使用淘汰"
+            },
+            "transcription_cache": {
+                "value": True,
+                "description": "是否按解码后音频指纹缓存转录结果,相同音频直接复用"
+            },
+            "max_retries": {
+                "value": 2,
+                "description": "转录失败时的最大尝试次数(含第一次),长音频任意一块失败都会整个文件重新转录"
+            },
+            "vad_filter": {
+                "value": False,
+                "description": "转录前进行人声检测,只转录人声区域(安装webrtcvad时可同时过滤纯音乐)"
+            },
+            "cascade_enabled": {
+                "value": False,
+                "description": "批量处理时启用级联转录:先用小模型预览开头判断相关性,相关的视频才完整转录"
+            },
+            "cascade_model": {
+                "value": "tiny",
+                "description": "级联转录预览使用的小模型"
+            },
+            "cascade_minutes": {
+                "value": 3,
+                "description": "级联转录预览的时长(分钟)"
+            },
+            "quality_mode": {
+                "value": False,
+                "description": "质量模式:先用model_name快速转录,再用refine_model重新解码低置信度片段"
+            },
+            "refine_model": {
+                "value": "medium",
+                "description": "质量模式下重新解码低置信度片段使用的模型"
+            },
+            "refine_logprob_threshold": {
+                "value": -0.8,
+                "description": "片段平均对数概率低于该值时视为低置信度"
+            },
+            "refine_compression_threshold": {
+                "value": 2.4,
+                "description": "片段压缩比高于该值(疑似重复幻觉)时视为低置信度"
+            },
+            "streaming": {
+                "value": False,
+                "description": "流式转录:按窗口解码并实时输出片段,每个窗口写入断点,中断后可继续"
+            },
+            "stream_window": {
+                "value": 300,
+                "description": "流式转录的窗口时长(秒)"
+            },
+            "batch_max_duration": {
+                "value": 120,
+                "description": "批量转录时,短于该时长(秒)的音频合并为一个批次解码"
+            },
+            "batch_size": {
+                "value": 8,
+                "description": "批量转录时每个批次包含的30秒窗口数"
             }
         }
     },
@@ -126,10 +224,87 @@ DEFAULT_CONFIGS = {
                 "value": 3,
                 "description": "最大并发下载数"
             },
+            "http_max_connections": {
+                "value": 100,
+                "description": "平台API异步HTTP客户端的连接池大小"
+            },
+            "http_max_per_host": {
+                "value": 10,
+                "description": "异步HTTP客户端对单个主机的最大并发请求数"
+            },
+            "http_timeout": {
+                "value": 15,
+                "description": "异步HTTP客户端的读写超时(秒)"
+            },
+            "audio_store_dir": {
+                "value": "downloads/audio_store",
+                "description": "音频存储目录,音频按内容哈希存放并记录索引"
+            },
+            "audio_store_quota_mb": {
+                "value": 20480,
+                "description": "音频存储的容量配额(MB),超出时按最近最少使用淘汰,0表示不限制"
+            },
+            "audio_store_max_age_days": {
+                "value": 7,
+                "description": "超过该天数未使用的音频会被淘汰,0表示不按时间淘汰"
+            },
+            "search_cache_ttl": {
+                "value": 21600,
+                "description": "搜索结果缓存时间(秒),缓存内直接返回,0表示不缓存"
+            },
+            "search_cache_stale_ttl": {
+                "value": 604800,
+                "description": "搜索缓存过期后仍可使用的时间(秒),期间先返回旧结果并在后台重新搜索"
+            },
+            "rate_limits": {
+                "value": {
+                    "bilibili": {
+                        "default": {"rate": 0.1, "burst": 1, "jitter": 0.5, "cooldown": 60},
+                        "search": {"rate": 0.25, "burst": 1, "jitter": 0.25},
+                        "player": {"rate": 0.5, "burst": 2, "jitter": 0.25}
+                    },
+                    "youtube": {
+                        "default": {"rate": 1.0, "burst": 3, "jitter": 0.2},
+                        "search": {"rate": 0.5, "burst": 2, "jitter": 0.5}
+                    },
+                    "xiaoyuzhou": {
+                        "default": {"rate": 0.3, "burst": 1, "jitter": 0.5}
+                    }
+                },
+                "description": "平台API限速(令牌桶),按 平台->接口 配置: rate 每秒请求数, burst 突发数, jitter 随机抖动(请求间隔的倍数), cooldown 触发412/429后暂停秒数;未配置的接口使用 default"
+            },
+            "download_chunk_size": {
+                "value": 1048576,
+                "description": "HTTP流式下载每次写入磁盘的块大小(字节)"
+            },
+            "download_parallel_parts": {
+                "value": 4,
+                "description": "大文件HTTP下载的并行分段数,1表示不并行"
+            },
+            "download_parallel_threshold_mb": {
+                "value": 64,
+                "description": "超过该大小(MB)且服务器支持Range时启用并行分段下载"
+            },
+            "platform_download_concurrency": {
+                "value": {"youtube": 3, "bilibili": 1, "xiaoyuzhou": 2},
+                "description": "各平台的最大并发下载数,同时受 max_concurrent_downloads 限制"
+            },
             "max_concurrent_transcriptions": {
                 "value": 2,
                 "description": "最大并发转录数"
             },
+            "pipeline_workers": {
+                "value": {"metadata": 1, "subtitle": 2, "download": 3, "transcribe": 2, "summary": 2},
+                "description": "批量处理流水线各阶段的worker数,未配置时下载和转写阶段分别使用 max_concurrent_downloads 和 max_concurrent_transcriptions"
+            },
+            "pipeline_queue_size": {
+                "value": 8,
+                "description": "批量处理流水线各阶段队列的容量,队列满时上游阶段等待"
+            },
+            "pipeline_batch_wait": {
+                "value": 2,
+                "description": "批量处理时短音频攒批的最长等待时间(秒),未攒够 whisper.batch_size 个窗口也会提交"
+            },
             "download_dir": {
                 "value": "downloads",
                 "description": "下载文件目录"
@@ -145,6 +320,10 @@ DEFAULT_CONFIGS = {
             "log_dir": {
                 "value": "logs",
                 "description": "日志文件目录"
+            },
+            "keep_native_audio": {
+                "value": True,
+                "description": "下载时保留原始音频流(m4a/opus)不转码为mp3,由转写器直接解码为PCM"
             }
         }
     }
@@ -166,6 +166,43 @@ class Subtitle(Base):
         return f"<Subtitle(id={self.id}, video_id={self.video_id}, language={self.language})>"
 
 
+class TranscriptionCache(Base):
+    """转录结果缓存表，按解码后音频的指纹复用Whisper转录结果"""
+    __tablename__ = "transcription_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_key = Column(String(64), nullable=False, unique=True, comment='指纹+模型+语言+提示词的哈希')
+    fingerprint = Column(String(64), nullable=False, index=True, comment='解码后PCM的SHA256')
+    model_name = Column(String(50), nullable=False)
+    language = Column(String(10))
+    content = Column(Text(length=4294967295), nullable=False)  # 纯文本内容
+    timed_content = Column(JSON, nullable=True)  # WebVTT格式的带时间戳内容
+    hit_count = Column(Integer, default=0)
+    create_time = Column(DateTime, default=datetime.utcnow)
+    last_hit_time = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<TranscriptionCache(id={self.id}, fingerprint={self.fingerprint}, model_name={self.model_name})>"
+
+
+class SearchCache(Base):
+    """搜索结果缓存表，按平台、关键词和排序方式保存按排名排列的搜索结果"""
+    __tablename__ = "search_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_key = Column(String(64), nullable=False, unique=True, comment='平台+关键词+排序方式的哈希')
+    platform = Column(String(20), nullable=False)
+    keyword = Column(String(255), nullable=False)
+    order_by = Column(String(20), nullable=False)
+    results = Column(JSON, nullable=False)  # 按排名排列的搜索结果
+    next_page = Column(Integer, nullable=True)  # 追加结果时请求的下一页,为空表示只能重新搜索
+    exhausted = Column(Boolean, default=False)  # 平台已没有更多结果
+    fetch_time = Column(DateTime, default=datetime.utcnow)  # 最近一次从第一页重新搜索的时间
+
+    def __repr__(self):
+        return f"<SearchCache(id={self.id}, platform={self.platform}, keyword={self.keyword}, count={len(self.results or [])})>"
+
+
 class GeneratedScript(Base):
     """生成的脚本表"""
     __tablename__ = "generated_scripts"
@@ -3,8 +3,9 @@ import time
 print(f"[{time.time()}] 开始导入模块...")
 
 start_time = time.time()
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 print(f"[{time.time()}] FastAPI相关模块导入完成，耗时: {time.time() - start_time:.2f}秒")
@@ -26,6 +27,7 @@ from api.routers import bili, config, history, youtube, video
 print(f"[{time.time()}] 路由模块导入完成，耗时: {time.time() - start_time:.2f}秒")
 
 start_time = time.time()
+from services.bili2text.core.http_client import close_http_client
 from services.bili2text.core.utils import redirect_stdout_stderr
 from services.bili2text.core.video_processor import VideoProcessor
 import os
@@ -47,6 +49,16 @@ async def lifespan(app: FastAPI):
     transcriber = AudioTranscriber()
     print(f"转写器初始化耗时: {time.time() - start_time:.2f}秒")
 
+    # 后台预热whisper模型，不阻塞服务启动
+    app.state.transcriber = transcriber
+    warmup_task = asyncio.create_task(transcriber.warm_up())
+    # 后台获取并定期刷新B站WBI签名密钥,全新安装时备选搜索也不必等待nav接口
+    wbi_keys_task = asyncio.create_task(downloader.maintain_wbi_keys())
+
+    # 定期淘汰过期音频
+    app.state.downloader = downloader
+    sweep_task = asyncio.create_task(downloader.sweep_audio_store())
+
     start_time = time.time()
     video_processor = VideoProcessor(downloader, transcriber)
     print(f"视频处理器初始化耗时: {time.time() - start_time:.2f}秒")
@@ -66,7 +78,12 @@ async def lifespan(app: FastAPI):
 
     yield
     print("服务关闭...")
-    # 关闭时执行的代码（如果需要）可以放在这里
+    warmup_task.cancel()
+    wbi_keys_task.cancel()
+    sweep_task.cancel()
+    downloader.audio_store.flush()
+    AudioTranscriber.shutdown_executor()
+    await close_http_client()
 
 
 app = FastAPI(
@@ -93,6 +110,19 @@ app.include_router(history.router)
 
 # app.include_router(youtube.router)
 
+
+@app.get("/health")
+async def health(request: Request):
+    """服务健康状态,包含转写器预热状态和音频存储统计"""
+    transcriber = getattr(request.app.state, "transcriber", None)
+    downloader = getattr(request.app.state, "downloader", None)
+    return {
+        "status": "ok",
+        "transcriber": transcriber.warmup_state if transcriber else None,
+        "audio_store": downloader.audio_store.stats() if downloader else None
+    }
+
+
 if __name__ == "__main__":
     print("启动服务器 http://localhost:3200")
     uvicorn.run(app, host="0.0.0.0", port=3200)
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 被淘汰的音频: (平台, 视频ID, 文件路径)
+EvictedAudio = Tuple[str, str, str]
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的SHA256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AudioStore:
+    """按内容寻址的音频存储
+
+    音频按内容哈希存放在 {root}/{哈希前两位}/{哈希}{扩展名},同一音频只保存一份;
+    (平台, 视频ID) 到文件的映射记录在磁盘索引 index.json 中,查找时不扫描目录。
+    查找只在内存中更新访问时间和命中统计,在下次写入或淘汰时一并落盘。
+    总大小超出配额或长时间未访问的音频按最近最少使用淘汰,淘汰时通过 on_evict 回调
+    让数据库中的 Video.audio_path 保持一致。
+    get/put 时可以固定(pin)音频,固定的音频在 release 之前不会被淘汰,
+    用于保护已下载、正在等待或进行转写的音频。
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(
+        self,
+        root_dir: Path,
+        quota_bytes: int,
+        max_age_days: float = 0,
+        on_evict: Optional[Callable[[List[EvictedAudio]], None]] = None
+    ):
+        """初始化音频存储
+
+        Args:
+            root_dir: 存储目录
+            quota_bytes: 总大小配额(字节),0表示不限制
+            max_age_days: 超过该天数未访问的音频会被淘汰,0表示不按时间淘汰
+            on_evict: 音频被淘汰后的回调
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root_dir / self.INDEX_FILE
+        self.quota_bytes = quota_bytes
+        self.max_age_days = max_age_days
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        # 内存中有尚未写入磁盘的访问时间或统计
+        self._dirty = False
+        # 被固定的音频内容哈希 -> 引用计数,只保存在内存中
+        self._pins: Dict[str, int] = {}
+        self._load_index()
+
+    def _load_index(self):
+        """加载磁盘索引,索引损坏时从空索引开始(旧文件会在之后的淘汰中被忽略)"""
+        self._entries: Dict[str, Dict] = {}
+        self._keys: Dict[str, str] = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_reclaimed": 0}
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries = data.get("entries", {})
+            self._keys = data.get("keys", {})
+            self._stats.update(data.get("stats", {}))
+        except (OSError, ValueError) as e:
+            print(f"读取音频索引失败,重建索引: {str(e)}")
+
+    def _save_index_locked(self):
+        """原子地写入磁盘索引"""
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"entries": self._entries, "keys": self._keys, "stats": self._stats}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    @staticmethod
+    def _key(platform: str, video_id: str) -> str:
+        return f"{platform}/{video_id}"
+
+    def _pin_locked(self, digest: str):
+        self._pins[digest] = self._pins.get(digest, 0) + 1
+
+    def get(self, platform: str, video_id: str, pin: bool = False) -> Optional[str]:
+        """查找视频对应的音频文件
+
+        Args:
+            platform: 平台
+            video_id: 视频ID
+            pin: 是否固定找到的音频,固定后需调用 release
+
+        Returns:
+            Optional[str]: 音频文件路径,不存在返回None
+        """
+        with self._lock:
+            digest = self._keys.get(self._key(platform, video_id))
+            entry = self._entries.get(digest) if digest else None
+            if entry and os.path.exists(entry["path"]):
+                entry["last_access"] = time.time()
+                self._stats["hits"] += 1
+                self._dirty = True
+                if pin:
+                    self._pin_locked(digest)
+                return entry["path"]
+
+            self._stats["misses"] += 1
+            self._dirty = True
+            if entry:
+                # 文件被外部删除,清理索引
+                self._drop_entry_locked(digest)
+                self._save_index_locked()
+            return None
+
+    def put(self, platform: str, video_id: str, file_path: str, pin: bool = False) -> str:
+        """把下载好的音频移入存储,内容相同的音频只保留一份
+
+        Args:
+            platform: 平台
+            video_id: 视频ID
+            file_path: 下载的音频文件,移入后原路径不再存在
+            pin: 是否固定该音频,固定后需调用 release
+
+        Returns:
+            str: 存储中的音频文件路径
+        """
+        digest = file_sha256(file_path)
+        target = self.root_dir / digest[:2] / f"{digest}{Path(file_path).suffix}"
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry and os.path.exists(entry["path"]):
+                os.remove(file_path)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(file_path, target)
+                entry = {"path": str(target), "size": target.stat().st_size, "created": time.time(), "keys": []}
+                self._entries[digest] = entry
+
+            key = self._key(platform, video_id)
+            old_digest = self._keys.get(key)
+            if old_digest and old_digest != digest and old_digest in self._entries:
+                self._entries[old_digest]["keys"].remove(key)
+            if key not in entry["keys"]:
+                entry["keys"].append(key)
+            self._keys[key] = digest
+            entry["last_access"] = time.time()
+            if pin:
+                self._pin_locked(digest)
+            self._save_index_locked()
+
+        # 刚写入的音频即使单独超出配额也保留,供接下来的转写使用
+        self.evict(keep=digest)
+        return entry["path"]
+
+    def release(self, path: str):
+        """释放 get/put 时固定的音频
+
+        Args:
+            path: get/put 返回的音频文件路径
+        """
+        digest = Path(path).stem
+        with self._lock:
+            count = self._pins.get(digest, 0)
+            if count > 1:
+                self._pins[digest] = count - 1
+            elif count:
+                del self._pins[digest]
+
+    def flush(self):
+        """把内存中的访问时间和统计写入磁盘索引"""
+        with self._lock:
+            if self._dirty:
+                self._save_index_locked()
+
+    def _drop_entry_locked(self, digest: str) -> List[EvictedAudio]:
+        """从索引中移除一个条目,返回它关联的视频"""
+        entry = self._entries.pop(digest)
+        evicted = []
+        for key in entry["keys"]:
+            if self._keys.get(key) == digest:
+                del self._keys[key]
+            platform, video_id = key.split("/", 1)
+            evicted.append((platform, video_id, entry["path"]))
+        return evicted
+
+    def evict(self, keep: Optional[str] = None) -> List[EvictedAudio]:
+        """淘汰过期音频,再按最近最少使用淘汰直到总大小不超过配额,固定的音频不会被淘汰
+
+        Args:
+            keep: 不淘汰的音频内容哈希
+
+        Returns:
+            List[EvictedAudio]: 被淘汰的音频
+        """
+        evicted = []
+        with self._lock:
+            by_access = sorted(self._entries.items(), key=lambda item: item[1].get("last_access", 0))
+            total = sum(entry["size"] for entry in self._entries.values())
+            cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days else None
+
+            for digest, entry in by_access:
+                if digest == keep or digest in self._pins:
+                    continue
+                expired = cutoff is not None and entry.get("last_access", 0) < cutoff
+                over_quota = self.quota_bytes and total > self.quota_bytes
+                if not expired and not over_quota:
+                    break
+                try:
+                    if os.path.exists(entry["path"]):
+                        os.remove(entry["path"])
+                except OSError as e:
+                    print(f"删除音频文件失败 {entry['path']}: {str(e)}")
+                    continue
+                total -= entry["size"]
+                self._stats["evictions"] += 1
+                self._stats["bytes_reclaimed"] += entry["size"]
+                evicted.extend(self._drop_entry_locked(digest))
+
+            if evicted or self._dirty:
+                self._save_index_locked()
+
+        if evicted:
+            print(f"音频存储淘汰 {len(evicted)} 个音频, 剩余 {total / 1024 / 1024:.0f}MB")
+            if self.on_evict:
+                try:
+                    self.on_evict(evicted)
+                except Exception as e:
+                    print(f"更新被淘汰音频的数据库记录失败: {str(e)}")
+        return evicted
+
+    def stats(self) -> Dict:
+        """存储统计:条目数、占用字节、命中率和已回收字节数"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "videos": len(self._keys),
+                "pinned": len(self._pins),
+                "bytes": sum(entry["size"] for entry in self._entries.values()),
+                "quota_bytes": self.quota_bytes,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                **self._stats
+            }
@@ -0,0 +1,306 @@
+import bisect
+import hashlib
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Whisper 要求的采样率
+SAMPLE_RATE = 16000
+
+
+def load_audio(file_path: str, sr: int = SAMPLE_RATE, max_seconds: Optional[float] = None) -> np.ndarray:
+    """使用ffmpeg将任意音频解码为单声道float32 PCM
+
+    Args:
+        file_path: 音频文件路径
+        sr: 目标采样率
+        max_seconds: 只解码开头的若干秒,None表示解码全部
+
+    Returns:
+        np.ndarray: 取值范围[-1, 1]的float32数组
+
+    Raises:
+        RuntimeError: ffmpeg解码失败
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads", "0",
+        "-i", str(file_path),
+        *(["-t", str(max_seconds)] if max_seconds else []),
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sr),
+        "-"
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"音频解码失败: {e.stderr.decode(errors='ignore')}") from e
+
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """使用ffprobe读取音频时长,不解码音频
+
+    Args:
+        file_path: 音频文件路径
+
+    Returns:
+        Optional[float]: 时长(秒),无法读取时返回None
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        str(file_path)
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        return float(out.decode().strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def native_audio_opts(opts: Dict) -> Dict:
+    """将yt-dlp下载选项改为保留原始音频流(m4a/opus),去掉转码为mp3的后处理
+
+    转写器会直接把原始音频一次性解码为16kHz PCM,无需先转码为mp3再解码
+
+    Args:
+        opts: yt-dlp下载选项
+
+    Returns:
+        Dict: 新的下载选项
+    """
+    opts = {
+        key: value for key, value in opts.items()
+        if key not in ("postprocessors", "extract_audio", "audio_format", "audio_quality")
+    }
+    opts["format"] = "bestaudio[ext=m4a]/bestaudio/best"
+    return opts
+
+
+def downloaded_filepath(info: Dict, default: str) -> str:
+    """从yt-dlp的extract_info结果中取出实际下载的文件路径
+
+    Args:
+        info: extract_info(download=True) 的返回值
+        default: 无法确定时返回的路径
+
+    Returns:
+        str: 文件路径
+    """
+    for download in (info or {}).get("requested_downloads") or []:
+        if download.get("filepath"):
+            return download["filepath"]
+    return default
+
+
+def fingerprint_audio(audio: np.ndarray) -> str:
+    """计算解码后PCM的指纹,采样一致的音频(如不同平台的搬运视频)得到相同指纹
+
+    Args:
+        audio: PCM数组
+
+    Returns:
+        str: SHA256十六进制字符串
+    """
+    pcm = np.round(audio * 32768.0).astype(np.int16)
+    return hashlib.sha256(pcm.tobytes()).hexdigest()
+
+
+def frame_energy(audio: np.ndarray, frame_seconds: float = 0.03, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """计算每一帧的RMS能量
+
+    Args:
+        audio: PCM数组
+        frame_seconds: 帧长(秒)
+        sr: 采样率
+
+    Returns:
+        np.ndarray: 每帧的RMS能量
+    """
+    frame_size = max(1, int(frame_seconds * sr))
+    n_frames = len(audio) // frame_size
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_size].reshape(n_frames, frame_size)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def split_on_silence(
+    audio: np.ndarray,
+    n_chunks: int,
+    search_seconds: float = 15.0,
+    frame_seconds: float = 0.03,
+    sr: int = SAMPLE_RATE
+) -> List[Tuple[int, int]]:
+    """将音频按近似等长切分为若干块,切点落在附近能量最低(最安静)的位置
+
+    Args:
+        audio: PCM数组
+        n_chunks: 目标块数
+        search_seconds: 在理想切点前后搜索静音的范围(秒)
+        frame_seconds: 能量计算的帧长(秒)
+        sr: 采样率
+
+    Returns:
+        List[Tuple[int, int]]: 每块的(起始采样点, 结束采样点)
+    """
+    total = len(audio)
+    if n_chunks <= 1 or total == 0:
+        return [(0, total)]
+
+    energy = frame_energy(audio, frame_seconds, sr)
+    frame_size = max(1, int(frame_seconds * sr))
+    search_frames = int(search_seconds / frame_seconds)
+
+    boundaries = [0]
+    for i in range(1, n_chunks):
+        ideal_frame = int(total * i / n_chunks) // frame_size
+        lo = max(ideal_frame - search_frames, boundaries[-1] // frame_size + 1)
+        hi = min(ideal_frame + search_frames, len(energy))
+        if lo >= hi:
+            continue
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        boundaries.append(quietest * frame_size)
+    boundaries.append(total)
+
+    return [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+
+
+def _webrtc_speech_flags(audio: np.ndarray, frame_seconds: float, sr: int) -> np.ndarray:
+    """使用webrtcvad(可选依赖)逐帧判断是否为人声"""
+    import webrtcvad
+
+    vad = webrtcvad.Vad(2)
+    frame_size = int(frame_seconds * sr)
+    pcm = np.round(audio * 32767.0).astype(np.int16)
+    n_frames = len(pcm) // frame_size
+    return np.array([
+        vad.is_speech(pcm[i * frame_size:(i + 1) * frame_size].tobytes(), sr)
+        for i in range(n_frames)
+    ], dtype=bool)
+
+
+def _energy_speech_flags(audio: np.ndarray, frame_seconds: float, sr: int) -> np.ndarray:
+    """基于能量的逐帧判断,阈值相对于底噪自适应"""
+    energy = frame_energy(audio, frame_seconds, sr)
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    db = 20 * np.log10(energy + 1e-10)
+    noise_floor = np.percentile(db, 10)
+    return db > max(noise_floor + 15, -50)
+
+
+def detect_speech_regions(
+    audio: np.ndarray,
+    min_speech_seconds: float = 0.3,
+    min_silence_seconds: float = 1.0,
+    padding_seconds: float = 0.2,
+    sr: int = SAMPLE_RATE
+) -> List[Tuple[int, int]]:
+    """检测音频中的人声区域
+
+    安装了webrtcvad时使用其语音检测(能区分人声与背景音乐),否则退化为基于能量的检测(只能去除静音)
+
+    Args:
+        audio: PCM数组
+        min_speech_seconds: 短于该时长的人声区域被丢弃
+        min_silence_seconds: 短于该时长的间隔会被合并
+        padding_seconds: 每个人声区域前后保留的余量
+        sr: 采样率
+
+    Returns:
+        List[Tuple[int, int]]: 人声区域的(起始采样点, 结束采样点)
+    """
+    frame_seconds = 0.03
+    try:
+        flags = _webrtc_speech_flags(audio, frame_seconds, sr)
+    except ImportError:
+        flags = _energy_speech_flags(audio, frame_seconds, sr)
+
+    frame_size = int(frame_seconds * sr)
+    regions = []
+    start = None
+    for i, is_speech in enumerate(flags):
+        if is_speech and start is None:
+            start = i
+        elif not is_speech and start is not None:
+            regions.append([start * frame_size, i * frame_size])
+            start = None
+    if start is not None:
+        regions.append([start * frame_size, len(flags) * frame_size])
+
+    # 合并间隔过短的区域
+    merged = []
+    for region in regions:
+        if merged and region[0] - merged[-1][1] < min_silence_seconds * sr:
+            merged[-1][1] = region[1]
+        else:
+            merged.append(region)
+
+    padding = int(padding_seconds * sr)
+    return [
+        (max(0, s - padding), min(len(audio), e + padding))
+        for s, e in merged
+        if e - s >= min_speech_seconds * sr
+    ]
+
+
+def concat_regions(
+    audio: np.ndarray,
+    regions: List[Tuple[int, int]],
+    sr: int = SAMPLE_RATE
+) -> Tuple[np.ndarray, List[Tuple[float, float, float]]]:
+    """拼接人声区域,并返回拼接后时间轴到原始时间轴的映射
+
+    Args:
+        audio: PCM数组
+        regions: 人声区域列表
+        sr: 采样率
+
+    Returns:
+        Tuple: (拼接后的PCM数组, [(拼接后起始秒, 原始起始秒, 时长秒), ...])
+    """
+    pieces = []
+    mapping = []
+    position = 0
+    last_end = 0
+    for start, end in regions:
+        # padding可能导致相邻区域重叠
+        start = max(start, last_end)
+        if end <= start:
+            continue
+        pieces.append(audio[start:end])
+        mapping.append((position / sr, start / sr, (end - start) / sr))
+        position += end - start
+        last_end = end
+
+    if not pieces:
+        return np.zeros(0, dtype=np.float32), []
+    return np.concatenate(pieces), mapping
+
+
+def remap_timestamp(t: float, mapping: List[Tuple[float, float, float]], is_end: bool = False) -> float:
+    """将拼接后音频上的时间映射回原始音频的时间
+
+    Args:
+        t: 拼接后音频上的时间(秒)
+        mapping: concat_regions返回的映射
+        is_end: 是否为片段结束时间;恰好落在两个区域交界处时,结束时间归入前一个区域,
+            开始时间归入后一个区域,避免片段跨越被移除的静音
+
+    Returns:
+        float: 原始音频上的时间(秒)
+    """
+    starts = [m[0] for m in mapping]
+    bisect_fn = bisect.bisect_left if is_end else bisect.bisect_right
+    index = max(0, bisect_fn(starts, t) - 1)
+    concat_start, orig_start, length = mapping[index]
+    return orig_start + min(max(t - concat_start, 0.0), length)
@@ -0,0 +1,226 @@
+"""Whisper转录吞吐量基准测试
+
+用法示例:
+    python -m services.bili2text.core.benchmark --models base --models small \
+        --threads 2 --threads 4 --beam-sizes 1 --beam-sizes 5 --lengths 30 --lengths 300 \
+        --audio samples/lecture.m4a --output bench.json
+
+不依赖数据库和配置服务,可在任意机器上直接运行。未指定 --audio 时使用合成音频,
+只能反映解码开销,建议用真实语音评估。
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from itertools import product
+from typing import Dict, List, Optional
+
+import click
+import numpy as np
+
+from services.bili2text.core.audio_utils import SAMPLE_RATE, load_audio
+from services.bili2text.core.engines import ENGINE_INT8, ENGINE_OPENAI, load_engine_model, resolve_model_key
+
+
+class PeakRSSMonitor:
+    """在后台线程中采样当前进程的常驻内存,记录一段时间内的峰值"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_rss() -> int:
+        """读取当前常驻内存(字节),非Linux平台退化为进程历史峰值"""
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_bytes = self.current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.current_rss())
+
+
+def build_reference_audio(length: float, audio_path: Optional[str] = None) -> np.ndarray:
+    """生成指定时长的参考音频
+
+    Args:
+        length: 时长(秒)
+        audio_path: 真实音频路径,不足时循环拼接;为空时生成合成音频
+
+    Returns:
+        np.ndarray: 16kHz的PCM数组
+    """
+    n_samples = int(length * SAMPLE_RATE)
+    if audio_path:
+        audio = load_audio(audio_path)
+        if len(audio) == 0:
+            raise ValueError(f"参考音频为空: {audio_path}")
+        repeats = int(np.ceil(n_samples / len(audio)))
+        return np.tile(audio, repeats)[:n_samples]
+
+    # 合成音频:音节速率调制的谐波加噪声,粗略模拟语音的能量起伏
+    rng = np.random.default_rng(0)
+    t = np.arange(n_samples) / SAMPLE_RATE
+    pitch = 150 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    voice = sum(np.sin(2 * np.pi * k * np.cumsum(pitch) / SAMPLE_RATE) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 4 * t) > 0).astype(np.float32)
+    audio = 0.1 * voice * envelope + 0.01 * rng.standard_normal(n_samples)
+    return audio.astype(np.float32)
+
+
+def load_benchmark_model(whisper, model_name: str, precision: str):
+    """按精度加载模型,int8使用与转写器相同的量化引擎
+
+    Returns:
+        tuple: (模型, 设备)
+    """
+    if precision == "int8":
+        key = resolve_model_key(model_name, ENGINE_INT8, cuda_available=False)
+    else:
+        key = resolve_model_key(model_name, ENGINE_OPENAI, cuda_available=precision == "fp16")
+    return load_engine_model(whisper, key), key.device
+
+
+def run_benchmark(
+    models: List[str],
+    threads: List[int],
+    beam_sizes: List[int],
+    precisions: List[str],
+    lengths: List[float],
+    audio_path: Optional[str] = None,
+    language: str = "zh",
+    temperature: float = 0.2,
+    repeat: int = 1
+) -> Dict:
+    """运行所有参数组合,返回可序列化的测试报告
+
+    whisper 只在温度为0时使用beam search,beam大于1的组合固定以温度0解码,
+    每条记录中的 temperature 为实际使用的温度。
+    AudioTranscriber._transcribe_sync 以温度0.2采样解码(beam_size不生效),
+    对应 beam=1、temperature=0.2 的组合
+    """
+    import whisper
+
+    references = {length: build_reference_audio(length, audio_path) for length in lengths}
+    report = {
+        "host": {
+            "cpu_count": os.cpu_count(),
+            "cuda": whisper.torch.cuda.is_available(),
+            "torch": whisper.torch.__version__,
+        },
+        "audio": audio_path or "synthetic",
+        "language": language,
+        "temperature": temperature,
+        "model_loads": [],
+        "runs": [],
+    }
+
+    for model_name, precision in product(models, precisions):
+        if precision == "fp16" and not whisper.torch.cuda.is_available():
+            print(f"跳过 {model_name}/{precision}: 没有可用的CUDA设备", file=sys.stderr)
+            continue
+
+        with PeakRSSMonitor() as monitor:
+            start_time = time.perf_counter()
+            model, device = load_benchmark_model(whisper, model_name, precision)
+            load_time = time.perf_counter() - start_time
+        report["model_loads"].append({
+            "model": model_name,
+            "precision": precision,
+            "device": device,
+            "load_seconds": round(load_time, 3),
+            "peak_rss_mb": round(monitor.peak_bytes / 1024 / 1024, 1),
+        })
+        print(f"{model_name}/{precision} 加载耗时 {load_time:.2f}秒", file=sys.stderr)
+
+        for n_threads, beam_size, length in product(threads, beam_sizes, lengths):
+            whisper.torch.set_num_threads(n_threads)
+            run_temperature = 0.0 if beam_size > 1 else temperature
+            for _ in range(repeat):
+                with PeakRSSMonitor() as monitor:
+                    start_time = time.perf_counter()
+                    # beam=1 且温度0.2时与 AudioTranscriber._transcribe_sync 的解码一致(不带提示词)
+                    model.transcribe(
+                        references[length],
+                        language=language,
+                        temperature=run_temperature,
+                        beam_size=beam_size if beam_size > 1 else None,
+                        fp16=precision == "fp16",
+                        condition_on_previous_text=False,
+                        verbose=None
+                    )
+                    elapsed = time.perf_counter() - start_time
+
+                rtf = elapsed / length
+                report["runs"].append({
+                    "model": model_name,
+                    "precision": precision,
+                    "device": device,
+                    "threads": n_threads,
+                    "beam_size": beam_size,
+                    "temperature": run_temperature,
+                    "audio_seconds": length,
+                    "elapsed_seconds": round(elapsed, 3),
+                    "rtf": round(rtf, 4),
+                    "peak_rss_mb": round(monitor.peak_bytes / 1024 / 1024, 1),
+                })
+                print(f"{model_name}/{precision} threads={n_threads} beam={beam_size} "
+                      f"len={length}s: RTF {rtf:.3f}", file=sys.stderr)
+
+        del model
+        if device == "cuda":
+            whisper.torch.cuda.empty_cache()
+
+    return report
+
+
+@click.command()
+@click.option("--models", multiple=True, default=["base"], show_default=True, help="模型名称,可重复指定")
+@click.option("--threads", multiple=True, type=int, default=[os.cpu_count() or 1], help="torch线程数,可重复指定")
+@click.option("--beam-sizes", multiple=True, type=int, default=[1], show_default=True,
+              help="beam大小,1表示不使用束搜索(与转写器一致)")
+@click.option("--precisions", multiple=True, type=click.Choice(["fp32", "fp16", "int8"]), default=["fp32"],
+              show_default=True, help="推理精度,fp16需要CUDA,int8为CPU动态量化")
+@click.option("--lengths", multiple=True, type=float, default=[30.0, 300.0], show_default=True,
+              help="参考音频时长(秒)")
+@click.option("--audio", "audio_path", default=None, help="参考音频文件,不指定时使用合成音频")
+@click.option("--language", default="zh", show_default=True, help="识别语言")
+@click.option("--temperature", default=0.2, show_default=True,
+              help="beam=1 时的解码温度,转写器使用0.2采样;whisper仅在温度为0时使用beam search,beam大于1时固定为0")
+@click.option("--repeat", default=1, show_default=True, help="每个组合重复次数")
+@click.option("--output", default=None, help="JSON报告输出路径,默认输出到标准输出")
+def main(models, threads, beam_sizes, precisions, lengths, audio_path, language, temperature, repeat, output):
+    """测试不同模型、线程数、beam大小和精度下的转录实时率(RTF)、峰值内存和模型加载时间"""
+    report = run_benchmark(
+        list(models), list(threads), list(beam_sizes), list(precisions), list(lengths),
+        audio_path=audio_path, language=language, temperature=temperature, repeat=repeat
+    )
+    content = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(content)
+    else:
+        print(content)
+
+
+if __name__ == "__main__":
+    main()
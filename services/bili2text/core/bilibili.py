@@ -1,15 +1,17 @@
-import requests
 import time
 import hashlib
+from pathlib import Path
 from urllib.parse import urlencode
 from typing import List, Dict, Optional
-from services.bili2text.core.utils import retry_on_failure
-from langchain_community.document_loaders import BiliBiliLoader
+from services.bili2text.core.utils import convert_to_webvtt, retry_on_failure
+from services.bili2text.core.audio_utils import downloaded_filepath, native_audio_opts
+from services.bili2text.core.http_client import get_http_client
+from services.bili2text.core.rate_limiter import get_rate_limiter
+from services.bili2text.core.wbi import WBI_SIGN_ERROR_CODES, WbiKeyManager
 import sys
 import yt_dlp
-import random
 import json
-import asyncio
+import httpx
 from bilibili_api import search
 from services.config_service import ConfigurationService
 
@@ -40,42 +42,46 @@ class BilibiliAPI:
         self.bili_jct = cookies['bili_jct']
         self.buvid3 = cookies['buvid3']
 
-        # 初始化会话和WBI密钥
-        self.session = requests.Session()
-        start_time = time.time()
-        self.img_key, self.sub_key = self._get_wbi_keys()
-        print(f"获取WBI keys耗时: {time.time() - start_time:.2f}秒")
-
-    def _get_wbi_keys(self) -> tuple:
+        # WBI密钥持久化在临时目录,快过期时后台刷新
+        temp_dir = Path(config_service.get_config("system", "temp_dir") or "temp")
+        self.wbi_keys = WbiKeyManager(
+            self._get_wbi_keys,
+            temp_dir / "bilibili_wbi_keys.json",
+            ttl=config_service.get_config("bilibili_download", "wbi_key_ttl") or 6 * 3600
+        )
+
+    @property
+    def http(self):
+        """共享的异步HTTP客户端"""
+        return get_http_client()
+
+    @property
+    def rate_limiter(self):
+        """共享的平台API限速器"""
+        return get_rate_limiter()
+
+    async def _get_wbi_keys(self) -> tuple:
         """获取WBI签名所需的keys"""
         try:
-            resp = self.session.get(self.nav_url, headers=self.headers)
+            start_time = time.time()
+            resp = await self.http.get(self.nav_url, headers=self.headers)
             data = resp.json()['data']
             img_url = data['wbi_img']['img_url']
             sub_url = data['wbi_img']['sub_url']
 
             img_key = img_url.split('/')[-1].split('.')[0]
             sub_key = sub_url.split('/')[-1].split('.')[0]
+            print(f"获取WBI keys耗时: {time.time() - start_time:.2f}秒")
             return img_key, sub_key
         except Exception as e:
             print(f"获取WBI keys失败: {str(e)}")
             raise
 
-    def _get_mixin_key(self, orig_key: str) -> str:
-        """生成混合密钥"""
-        MIXIN_KEY_ENC_TAB = [
-            46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35,
-            27, 43, 5, 49, 33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13,
-            37, 48, 7, 16, 24, 55, 40, 61, 26, 17, 0, 1, 60, 51, 30, 4,
-            22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11, 36, 20, 34, 44, 52
-        ]
-        mixed_key = ''.join([orig_key[i] for i in MIXIN_KEY_ENC_TAB])
-        return mixed_key[:32]
-
-    def _sign_params(self, params: Dict) -> Dict:
+    async def _sign_params(self, params: Dict) -> Dict:
         """对参数进行WBI签名"""
+        mixin_key = await self.wbi_keys.get_mixin_key()
+        params.pop('w_rid', None)
         params['wts'] = int(time.time())
-        mixin_key = self._get_mixin_key(self.img_key + self.sub_key)
         sorted_params = dict(sorted(params.items()))
         query = urlencode(sorted_params)
         text = query + mixin_key
@@ -83,7 +89,8 @@ class BilibiliAPI:
         params['w_rid'] = w_rid
         return params
 
-    def search_videos_old(self, keyword: str, max_results: int = 200, batch_size: int = 20) -> List[Dict]:
+    async def search_videos_old(self, keyword: str, max_results: int = 200, batch_size: int = 20,
+                                order: str = "totalrank") -> List[Dict]:
         """原始的搜索实现方法"""
         try:
             print(f"搜索B站视频: {keyword}, 目标数量: {max_results}")
@@ -102,7 +109,7 @@ class BilibiliAPI:
                 params = {
                     'keyword': keyword,
                     'page': page,
-                    'order': 'totalrank',
+                    'order': order,
                     'search_type': 'video',  # 明确指定搜索类型
                     'tids': 0,  # 所有分区
                     'duration': 0  # 所有时长
@@ -114,34 +121,29 @@ class BilibiliAPI:
                     'Referer': 'https://search.bilibili.com',
                     'Accept': 'application/json, text/plain, */*',
                     'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Connection': 'keep-alive',
+                    'Accept-Encoding': 'gzip, deflate',
                     'Cookie': f'SESSDATA={self.sessdata}; bili_jct={self.bili_jct}; buvid3={self.buvid3}'
                 }
                 
-                # 添加WBI签名
-                params = self._sign_params(params)
-                
                 try:
-                    # 添加较长的初始延迟
-                    initial_delay = random.uniform(10, 15)
-                    print(f"初始等待 {initial_delay:.1f} 秒...")
-                    time.sleep(initial_delay)
+                    # 与其他搜索请求共用B站搜索接口的请求预算
+                    await self.rate_limiter.acquire("bilibili", "search")
+                    
+                    # 限速等待可能较久,等待结束后再签名,保证wts时间戳是新的
+                    params = await self._sign_params(params)
                     
-                    response = self.session.get(
+                    response = await self.http.get(
                         self.search_url,
                         params=params,
                         headers=headers,
-                        timeout=15,
-                        proxies=None  # 如果有代理可以在这里配置
+                        timeout=15
                     )
+                    # 412/429 时限速器自动降速并暂停,下次 acquire 会等待更久
+                    self.rate_limiter.report("bilibili", "search", response.status_code)
                     
                     if response.status_code == 412:
-                        print("触发反爬虫机制，等待更长时间...")
+                        print("触发反爬虫机制，降速后重试...")
                         retry_count += 1
-                        wait_time = random.uniform(30, 60)  # 较长的等待时间
-                        print(f"等待 {wait_time:.1f} 秒后重试...")
-                        time.sleep(wait_time)
                         continue
                     
                     response.raise_for_status()
@@ -170,26 +172,24 @@ class BilibiliAPI:
                             remaining -= len(batch_videos)
                             page += 1
                             retry_count = 0  # 重置重试计数
-                            
-                            # 批次间的随机延迟
-                            if remaining > 0:
-                                delay = random.uniform(15, 25)  # 增加延迟时间
-                                print(f"等待 {delay:.1f} 秒后继续下一批次")
-                                time.sleep(delay)
                         else:
                             print("本页没有找到视频，搜索结束")
                             break
+                    elif data.get('code') in WBI_SIGN_ERROR_CODES:
+                        # 密钥可能已被轮换,重新获取后用新签名重试
+                        retry_count += 1
+                        await self.wbi_keys.invalidate()
+                        continue
                     else:
                         print(f"接口返回异常: {data}")
+                        if data.get('code') == -412:
+                            # 请求被风控拦截,与HTTP 412同样处理
+                            self.rate_limiter.report("bilibili", "search", 412)
                         retry_count += 1
-                        time.sleep(random.uniform(20, 30))
                         
-                except requests.RequestException as e:
+                except httpx.HTTPError as e:
                     print(f"请求失败: {str(e)}")
                     retry_count += 1
-                    wait_time = random.uniform(20, 30)
-                    print(f"等待 {wait_time:.1f} 秒后重试...")
-                    time.sleep(wait_time)
                     continue
                 
             if retry_count >= max_retries:
@@ -203,12 +203,68 @@ class BilibiliAPI:
             print(error_msg, file=sys.stderr)
             return []
 
-    async def search_videos(self, keyword: str, max_results: int = 200) -> List[Dict]:
+    async def search_page(self, keyword: str, page: int, order: str = "totalrank") -> Optional[List[Dict]]:
+        """使用 bilibili-api 获取一页搜索结果
+        
+        Args:
+            keyword: 搜索关键词
+            page: 页码,从1开始
+            order: 排序方式,同 search.OrderVideo 的取值(totalrank/click/pubdate/dm/stow)
+            
+        Returns:
+            Optional[List[Dict]]: 本页的视频列表(已跳过课堂视频),没有更多结果时返回None
+        """
+        await self.rate_limiter.acquire("bilibili", "search")
+        search_result = await search.search_by_type(
+            keyword,
+            search_type=search.SearchObjectType.VIDEO,
+            order_type=search.OrderVideo(order),
+            page=page
+        )
+        
+        if not search_result['result']:
+            return None
+        
+        videos = []
+        for video in search_result['result']:
+            # 判断是否为课堂视频
+            is_course = (
+                video.get('type') == 'ketang' or  # 类型为课堂
+                bool(video.get('episode_count_text', '').find('课时') != -1)  # 包含课时信息
+            )
+            if is_course:
+                print(f"跳过课堂视频: {video['title']}")
+                continue
+            
+            # 提取更多必要的视频信息
+            videos.append({
+                'id': video['bvid'],
+                'aid': video['aid'],
+                'title': video['title'].replace('<em class="keyword">', '').replace('</em>', ''),
+                'author': video['author'],
+                'duration': video['duration'],
+                'view_count': video['play'],
+                'description': video.get('description', ''),
+                'pubdate': video.get('pubdate', 0),
+                'cover': video.get('pic', '').lstrip('//'),  # 移除开头的 //
+                'tags': video.get('tag', '').split(','),
+                'danmaku_count': video.get('danmaku', 0),
+                'like_count': video.get('like', 0),
+                'favorite_count': video.get('favorites', 0),
+                'comment_count': video.get('review', 0),
+                'type_name': video.get('typename', '')
+            })
+        
+        print(f"第{page}页成功获取 {len(search_result['result'])} 个视频")
+        return videos
+
+    async def search_videos(self, keyword: str, max_results: int = 200, order: str = "totalrank") -> List[Dict]:
         """使用 bilibili-api 搜索B站视频
         
         Args:
             keyword: 搜索关键词
             max_results: 最大结果数量
+            order: 排序方式
             
         Returns:
             List[Dict]: 搜索结果列表
@@ -219,58 +275,12 @@ class BilibiliAPI:
             page = 1
             
             while len(videos) < max_results:
-                # 使用 bilibili-api 进行搜索
-                search_result = await search.search_by_type(
-                    keyword,
-                    search_type=search.SearchObjectType.VIDEO,
-                    page=page
-                )
-                
-                if not search_result['result']:
+                page_videos = await self.search_page(keyword, page, order)
+                if page_videos is None:
                     print("没有更多视频结果")
                     break
-                
-                # 处理搜索结果
-                for video in search_result['result']:
-                    if len(videos) >= max_results:
-                        break
-                        
-                    # 判断是否为课堂视频
-                    is_course = (
-                        video.get('type') == 'ketang' or  # 类型为课堂
-                        bool(video.get('episode_count_text', '').find('课时') != -1)  # 包含课时信息
-                    )
-                    if is_course:
-                        print(f"跳过课堂视频: {video['title']}")
-                        continue
-                    
-                    # 提取更多必要的视频信息
-                    video_info = {
-                        'id': video['bvid'],
-                        'aid': video['aid'],
-                        'title': video['title'].replace('<em class="keyword">', '').replace('</em>', ''),
-                        'author': video['author'],
-                        'duration': video['duration'],
-                        'view_count': video['play'],
-                        'description': video.get('description', ''),
-                        'pubdate': video.get('pubdate', 0),
-                        'cover': video.get('pic', '').lstrip('//'),  # 移除开头的 //
-                        'tags': video.get('tag', '').split(','),
-                        'danmaku_count': video.get('danmaku', 0),
-                        'like_count': video.get('like', 0),
-                        'favorite_count': video.get('favorites', 0),
-                        'comment_count': video.get('review', 0),
-                        'type_name': video.get('typename', '')
-                    }
-                    videos.append(video_info)
-                
-                print(f"第{page}页成功获取 {len(search_result['result'])} 个视频")
+                videos.extend(page_videos[:max_results - len(videos)])
                 page += 1
-                
-                # 添加随机延迟
-                delay = random.uniform(3, 5)
-                print(f"等待 {delay:.1f} 秒后继续下一页")
-                await asyncio.sleep(delay)
             
             print(f"搜索完成，共找到 {len(videos)} 个视频")
             return videos
@@ -279,55 +289,91 @@ class BilibiliAPI:
             error_msg = f"B站搜索失败: {str(e)}"
             print(error_msg, file=sys.stderr)
             print("出错后切换到备选搜索方法...")
-            return self.search_videos_old(keyword, max_results)
+            return await self.search_videos_old(keyword, max_results, order=order)
 
-            raise
+    @staticmethod
+    def _normalize_subtitle_language(lan: str) -> str:
+        """把B站字幕语言代码(zh-CN、ai-zh、en-US等)转换为两位语言代码"""
+        return lan.lower().replace('ai-', '').split('-')[0]
+
+    def _pick_subtitle_track(self, tracks: List[Dict]) -> Optional[Dict]:
+        """按语言优先级选择字幕轨道,人工字幕优先于AI字幕"""
+        for lang in ('zh', 'en'):
+            candidates = [t for t in tracks if self._normalize_subtitle_language(t.get('lan', '')) == lang]
+            if candidates:
+                return min(candidates, key=lambda t: t.get('lan', '').startswith('ai-'))
+        return tracks[0] if tracks else None
 
-    def get_subtitle(self, bvid: str) -> Optional[str]:
-        """获取视频字幕"""
+    async def get_subtitle(self, bvid: str, video_info: Optional[Dict] = None) -> Optional[Dict]:
+        """通过播放器接口获取视频字幕
+
+        Args:
+            bvid: 视频BV号
+            video_info: get_video_info 返回的视频信息,提供 cid/aid,避免重复请求
+
+        Returns:
+            Optional[Dict]: 字幕,包含 text(纯文本)、timed_content(WebVTT格式的带时间戳分段)和 language;
+                没有字幕时返回None
+        """
         print(f"尝试获取视频字幕: {bvid}")
 
         try:
-            # 创建BiliBiliLoader实例
-            loader = BiliBiliLoader(
-                video_urls=[f"https://www.bilibili.com/video/{bvid}"],
-                sessdata=self.sessdata,
-                bili_jct=self.bili_jct,
-                buvid3=self.buvid3
-            )
+            if not video_info or not video_info.get('cid'):
+                video_info = await self.get_video_info(bvid)
+            cid, aid = video_info['cid'], video_info.get('aid')
+
+            await self.rate_limiter.acquire("bilibili", "player")
+            # 未登录时播放器接口不返回字幕
+            headers = {**self.headers, 'Cookie': f'SESSDATA={self.sessdata}; buvid3={self.buvid3}'}
+            response = await self.http.get(self.subtitle_url, params={'bvid': bvid, 'cid': cid}, headers=headers)
+            self.rate_limiter.report("bilibili", "player", response.status_code)
+            response.raise_for_status()
+            data = response.json()
+            if data.get('code') != 0:
+                print(f"获取字幕列表失败: {data.get('message')}", file=sys.stderr)
+                return None
 
-            # 加载视频信息和字幕
-            print("正在加载视频信息...")
-            docs = loader.load()
+            player_data = data['data']
+            # 接口偶尔返回其他视频的字幕,核对cid/aid
+            if player_data.get('cid') != cid or (aid and player_data.get('aid') != aid):
+                print("字幕列表与视频不匹配,忽略")
+                return None
 
-            if not docs:
+            track = self._pick_subtitle_track(player_data.get('subtitle', {}).get('subtitles') or [])
+            if not track or not track.get('subtitle_url'):
                 print("未找到字幕内容")
                 return None
 
-            # 获取第一个文档的内容
-            content = docs[0].page_content
-
-            # 提取字幕内容
-            if content:
-                # 检查是否包含标题和描述
-                if "Video Title:" in content and "Transcript:" in content:
-                    transcript = content.split("Transcript:")[1].strip()
-                    print("成功获取字幕内容")
-                    return transcript
-                # 如果内容不为空但格式不对，可能是错误的字幕
-                else:
-                    print("获取到的内容格式不正确，可能是错误的字幕")
-                    return None
-
-            print("未找到字幕内容")
-            return None
+            subtitle_url = track['subtitle_url']
+            if subtitle_url.startswith('//'):
+                subtitle_url = f"https:{subtitle_url}"
+            response = await self.http.get(subtitle_url, headers=self.headers)
+            response.raise_for_status()
+            body = response.json().get('body') or []
+
+            segments = [
+                {'start': line['from'], 'end': line['to'], 'text': line['content'].strip()}
+                for line in body
+                if line.get('content', '').strip()
+            ]
+            if not segments:
+                print("未找到字幕内容")
+                return None
+
+            print(f"成功获取字幕内容 ({track.get('lan_doc', track.get('lan'))}, {len(segments)} 段)")
+            language = self._normalize_subtitle_language(track.get('lan', 'zh'))
+            return {
+                'text': ' '.join(segment['text'] for segment in segments),
+                'timed_content': convert_to_webvtt(segments, language),
+                'language': language
+            }
 
         except Exception as e:
             error_msg = f"获取字幕失败: {str(e)}"
             print(error_msg, file=sys.stderr)
             return None
 
-    def get_video_info(self, bvid: str) -> Dict:
+    async def get_video_info(self, bvid: str) -> Dict:
         """获取视频详细信息"""
         try:
             print(f"获取视频信息: {bvid}")
@@ -337,7 +383,7 @@ class BilibiliAPI:
             }
 
             # 发送请求
-            response = self.session.get(
+            response = await self.http.get(
                 self.view_url,
                 params=params,
                 headers=self.headers
@@ -397,8 +443,12 @@ class BilibiliAPI:
             
             # 配置yt-dlp选项
             ydl_opts = base_opts.copy()
+            native_audio = config_service.get_config("system", "keep_native_audio")
+            if native_audio:
+                # 保留原始音频流,由转写器直接解码,省去转码为mp3的步骤
+                ydl_opts = native_audio_opts(ydl_opts)
             ydl_opts.update({
-                'outtmpl': output_path.replace('.mp3', ''),
+                'outtmpl': output_path.replace('.mp3', '.%(ext)s' if native_audio else ''),
                 # 添加cookies
                 'cookies': {
                     'SESSDATA': self.sessdata,
@@ -408,9 +458,9 @@ class BilibiliAPI:
             })
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-                
-            return output_path
+                info = ydl.extract_info(url, download=True)
+
+            return downloaded_filepath(info, output_path) if native_audio else output_path
             
         except Exception as e:
             error_msg = f"下载B站音频失败: {str(e)}"
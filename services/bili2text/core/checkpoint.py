@@ -0,0 +1,69 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+
+class TranscriptionCheckpoint:
+    """转录断点文件,流式转录时逐窗口追加已完成的片段,任务中断后可从最后提交的位置继续"""
+
+    def __init__(self, checkpoint_dir: Path, platform: str, video_id: str, job_key: str):
+        """初始化断点
+
+        Args:
+            checkpoint_dir: 断点文件目录
+            platform: 平台
+            video_id: 视频ID
+            job_key: 音频指纹+模型+语言等参数的哈希,参数变化时旧断点作废
+        """
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.path = checkpoint_dir / f"{platform}_{video_id}.json"
+        self.job_key = job_key
+        self.offset = 0
+        self.segments: List[Dict] = []
+
+    def load(self) -> bool:
+        """加载已有断点
+
+        Returns:
+            bool: 是否存在可用的断点
+        """
+        if not self.path.exists():
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取转录断点失败,重新开始: {str(e)}")
+            return False
+
+        if data.get("job_key") != self.job_key:
+            print("转录参数或音频已变化,丢弃旧断点")
+            return False
+
+        self.offset = data["offset"]
+        self.segments = data["segments"]
+        return self.offset > 0
+
+    def commit(self, offset: int, segments: List[Dict]):
+        """追加一个窗口的片段并原子地写入断点文件
+
+        Args:
+            offset: 已完成部分的结束位置(采样点)
+            segments: 该窗口的片段(已是全局时间戳)
+        """
+        self.offset = offset
+        self.segments.extend(segments)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "job_key": self.job_key,
+                "offset": self.offset,
+                "segments": self.segments
+            }, f, ensure_ascii=False, default=lambda value: value.item() if hasattr(value, "item") else str(value))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """转录完成后删除断点文件"""
+        if self.path.exists():
+            self.path.unlink()
@@ -1,15 +1,27 @@
+import asyncio
+import inspect
 import os
-import random
 import re
 import sys
+import threading
 import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 from db.models.subtitle import SubtitleSource, Platform
+from services.bili2text.core.audio_store import AudioStore
+from services.bili2text.core.rate_limiter import get_rate_limiter
 from services.bili2text.core.subtitle_manager import SubtitleManager
 from services.bili2text.core.utils import retry_on_failure
 from services.config_service import ConfigurationService
 
+# 各平台默认的搜索排序方式
+DEFAULT_SEARCH_ORDER = {
+    Platform.BILIBILI: "totalrank",
+    Platform.YOUTUBE: "relevance",
+}
+
 
 class AudioDownloader:
     """音频下载器,负责从各平台下载音频"""
@@ -26,8 +38,13 @@ class AudioDownloader:
         self._youtube_api = None
         self._subtitle_manager = None
         self._xiaoyuzhou_api = None  # 添加小宇宙API实例
+        self._audio_store = None
         self.config_path = config_path
-        self.last_api_request_time = 0  # 记录上次请求API的时间
+        # 并发下载控制:全局上限 + 各平台上限,在首次使用时创建
+        self._download_semaphore: Optional[asyncio.Semaphore] = None
+        self._platform_semaphores: Dict[Platform, asyncio.Semaphore] = {}
+        # 正在后台刷新的搜索缓存
+        self._search_revalidations: Dict[tuple, asyncio.Task] = {}
 
         # 确保下载目录存在
         self.download_dir.mkdir(parents=True, exist_ok=True)
@@ -69,6 +86,75 @@ class AudioDownloader:
             self._subtitle_manager = SubtitleManager(self.config_path)
         return self._subtitle_manager
 
+    @property
+    def audio_store(self) -> AudioStore:
+        """音频存储,淘汰音频时同步清空数据库中的音频路径"""
+        if self._audio_store is None:
+            config_service = ConfigurationService()
+            store_dir = config_service.get_config("system", "audio_store_dir") or self.download_dir / "audio_store"
+            quota_mb = config_service.get_config("system", "audio_store_quota_mb") or 0
+            self._audio_store = AudioStore(
+                Path(store_dir),
+                quota_bytes=quota_mb * 1024 * 1024,
+                max_age_days=config_service.get_config("system", "audio_store_max_age_days") or 0,
+                on_evict=self.subtitle_manager.clear_audio_paths
+            )
+        return self._audio_store
+
+    async def maintain_wbi_keys(self):
+        """服务运行期间获取并定期刷新B站WBI签名密钥,首个签名请求无需等待nav接口
+
+        B站API(连同yt-dlp和bilibili-api)在线程中导入和初始化,不阻塞事件循环
+        """
+        try:
+            bili_api = await asyncio.to_thread(lambda: self.bili_api)
+        except Exception as e:
+            print(f"初始化B站API失败,跳过WBI密钥预热: {str(e)}", file=sys.stderr)
+            return
+        await bili_api.wbi_keys.keep_fresh()
+
+    async def sweep_audio_store(self, interval: float = 3600):
+        """定期淘汰音频存储中过期的音频
+        
+        Args:
+            interval: 两次清理的间隔(秒)
+        """
+        while True:
+            try:
+                await asyncio.to_thread(self.audio_store.evict)
+            except Exception as e:
+                print(f"清理音频存储失败: {str(e)}", file=sys.stderr)
+            await asyncio.sleep(interval)
+
+    @asynccontextmanager
+    async def download_slot(self, platform: Platform):
+        """占用一个下载名额
+        
+        同时受 system.max_concurrent_downloads 的全局上限和
+        system.platform_download_concurrency 中该平台的上限约束
+        
+        Args:
+            platform: 平台
+        """
+        config_service = ConfigurationService()
+        if self._download_semaphore is None:
+            max_downloads = config_service.get_config("system", "max_concurrent_downloads") or 1
+            self._download_semaphore = asyncio.Semaphore(max_downloads)
+        if platform not in self._platform_semaphores:
+            limits = config_service.get_config("system", "platform_download_concurrency") or {}
+            self._platform_semaphores[platform] = asyncio.Semaphore(limits.get(platform.value, 1))
+
+        async with self._platform_semaphores[platform]:
+            async with self._download_semaphore:
+                yield
+
+    @staticmethod
+    async def _call_api(func, *args):
+        """调用平台API方法,异步实现直接等待,阻塞实现放到线程中执行"""
+        if inspect.iscoroutinefunction(func):
+            return await func(*args)
+        return await asyncio.to_thread(func, *args)
+
     def _sanitize_filename(self, filename: str) -> str:
         """清理文件名,移除不合法字符
         
@@ -89,20 +175,6 @@ class AudioDownloader:
             filename = filename[:197] + "..."
         return filename.strip('_')
 
-    def _get_existing_file(self, video_id: str) -> Optional[Path]:
-        """检查是否存在已下载的文件
-        
-        Args:
-            video_id: 视频ID
-            
-        Returns:
-            Optional[Path]: 文件路径,不存在则返回None
-        """
-        existing_files = list(self.download_dir.glob(f"*{video_id}.mp3"))
-        if existing_files:
-            return existing_files[0]
-        return None
-
     def _extract_video_id(self, url: str) -> str:
         """从URL中提取视频/播客ID
         
@@ -167,11 +239,12 @@ class AudioDownloader:
         return True
 
     @retry_on_failure()
-    async def download_media(self, topic: str, url: str) -> Dict:
+    async def download_media(self, topic: str, url: str, pin: bool = False) -> Dict:
         """下载媒体文件
         
         Args:
             url: 视频URL
+            pin: 是否在音频存储中固定返回的音频,转写完成后需调用 audio_store.release
             
         Returns:
             Dict: 下载结果,包含:
@@ -214,143 +287,219 @@ class AudioDownloader:
                     'platform': platform
                 }
 
-            # 2. 根据平台选择API并检查请求频率
-            api = self.youtube_api if platform == Platform.YOUTUBE else self.bili_api if platform == Platform.BILIBILI else self.xiaoyuzhou_api
-
-            # 对B站API请求进行频率控制
-            if platform == Platform.BILIBILI:
-                current_time = time.time()
-                time_since_last_request = current_time - self.last_api_request_time
-                delay = random.uniform(10, 20)  # 10-20秒随机延迟
-                if time_since_last_request < delay:  # 假设需要10秒间隔
-                    delay = delay - time_since_last_request
-                    print(f"等待 {delay:.1f} 秒以控制请求频率...")
-                    time.sleep(delay)
-                self.last_api_request_time = time.time()
-
-            # 3. 获取视频信息
-            print(f"请求视频信息 [{platform.value}] {video_id} {video_title if video_info else ''}...")
-            api_video_info = api.get_video_info(video_id)
-
-            # 4. 尝试获取官方字幕
-            print("尝试获取官方字幕...")
-            subtitle_text = api.get_subtitle(video_id)
-            if subtitle_text:
-                print("找到官方字幕,保存中...")
-                self.subtitle_manager.save_video_info(api_video_info, platform)
-                try:
-                    await self.subtitle_manager.save_subtitle(
-                        topic=topic,
-                        video_id=video_id,
-                        content=subtitle_text,
-                        timed_content=None,
-                        source=SubtitleSource.OFFICIAL,
-                        platform=platform,
-                        platform_vid=video_id,
-                        language='zh'
-                    )
-                except Exception as e:
-                    print(f"保存字幕失败: {str(e)}")
-                    raise
-                return {
-                    'type': 'subtitle',
-                    'content': subtitle_text,
-                    'video_id': video_id,
-                    'platform': platform
-                }
+            async with self.download_slot(platform):
+                fetched = await self.fetch_official_subtitle(topic, url, video_id, platform, video_info)
+                if fetched['type'] == 'subtitle':
+                    return fetched
+                return await self.download_audio_file(url, video_id, platform, fetched['video_info'], pin)
 
-            # 5. 未找到字幕,下载音频
-            print("未找到官方字幕,准备下载音频...")
+        except Exception as e:
+            error_msg = f"下载失败: {str(e)}"
+            print(error_msg, file=sys.stderr)
+            raise
 
-            # 检查是否有现成的音频文件
+    async def fetch_official_subtitle(self, topic: str, url: str, video_id: str, platform: Platform,
+                                      video_info: Optional[Dict] = None) -> Dict:
+        """请求平台API获取视频信息和官方字幕,找到字幕时保存
+        
+        B站API是异步实现,直接等待;YouTube和小宇宙API是阻塞调用,放到线程中执行。
+        YouTube的视频信息来自 YoutubeAPI.get_info 的缓存,只在实际调用yt-dlp时占用限速器的请求预算
+        
+        Args:
+            topic: 主题
+            url: 视频URL
+            video_id: 视频ID
+            platform: 平台
+            video_info: 数据库中已有的视频信息
+            
+        Returns:
+            Dict: 找到字幕时同 download_media 的字幕结果;
+                否则 type 为 'metadata',video_info 为平台返回的视频信息
+        """
+        video_title = f"「{video_info['title']}」" if video_info and video_info.get('title') else ''
+        # 2. 根据平台选择API并检查请求频率
+        api = self.youtube_api if platform == Platform.YOUTUBE else self.bili_api if platform == Platform.BILIBILI else self.xiaoyuzhou_api
+
+        # 平台API请求共用限速器的请求预算;YouTube在 get_info 未命中缓存时才占用
+        if platform != Platform.YOUTUBE:
+            await get_rate_limiter().acquire(platform.value, "video_info")
+
+        # 3. 获取视频信息
+        print(f"请求视频信息 [{platform.value}] {video_id} {video_title}...")
+        api_video_info = await self._call_api(api.get_video_info, video_id)
+
+        # 4. 尝试获取官方字幕
+        print("尝试获取官方字幕...")
+        if platform == Platform.BILIBILI:
+            # 复用刚获取的cid/aid,直接返回纯文本和带时间戳的分段
+            subtitle = await api.get_subtitle(video_id, api_video_info)
+        else:
+            subtitle = await self._call_api(api.get_subtitle, video_id)
+        if subtitle:
+            print("找到官方字幕,保存中...")
+            if isinstance(subtitle, dict):
+                subtitle_text, timed_content, language = subtitle['text'], subtitle['timed_content'], subtitle['language']
+            else:
+                subtitle_text, timed_content, language = subtitle, None, 'zh'
+            self.subtitle_manager.save_video_info(api_video_info, platform)
+            try:
+                await self.subtitle_manager.save_subtitle(
+                    topic=topic,
+                    video_id=video_id,
+                    content=subtitle_text,
+                    timed_content=timed_content,
+                    source=SubtitleSource.OFFICIAL,
+                    platform=platform,
+                    platform_vid=video_id,
+                    language=language
+                )
+            except Exception as e:
+                print(f"保存字幕失败: {str(e)}")
+                raise
+            return {
+                'type': 'subtitle',
+                'content': subtitle_text,
+                'video_id': video_id,
+                'platform': platform
+            }
+
+        print("未找到官方字幕")
+        return {
+            'type': 'metadata',
+            'video_id': video_id,
+            'platform': platform,
+            'video_info': api_video_info
+        }
+
+    async def download_audio_file(self, url: str, video_id: str, platform: Platform, api_video_info: Dict,
+                                  pin: bool = False) -> Dict:
+        """下载音频文件并保存视频信息,已有音频文件时直接复用
+        
+        下载是阻塞调用,放到线程中执行,多个下载可以并发进行
+        
+        Args:
+            url: 视频URL
+            video_id: 视频ID
+            platform: 平台
+            api_video_info: fetch_official_subtitle 返回的视频信息
+            pin: 是否在音频存储中固定返回的音频,转写完成后需调用 audio_store.release
+            
+        Returns:
+            Dict: 同 download_media 的音频结果
+        """
+        # 5. 未找到字幕,下载音频
+        print("准备下载音频...")
+        api = self.youtube_api if platform == Platform.YOUTUBE else self.bili_api if platform == Platform.BILIBILI else self.xiaoyuzhou_api
+
+        # 检查音频存储中是否有现成的音频文件
+        audio_path = await asyncio.to_thread(self.audio_store.get, platform.value, video_id, pin)
+        if not audio_path:
+            # 音频存储启用前下载的文件,移入存储后复用
             video_info = self.subtitle_manager.get_video_info(platform, video_id)
-            if video_info and video_info['audio_path']:
-                audio_path = video_info['audio_path']
-                if Path(audio_path).exists():
-                    print(f"找到现有音频文件: {audio_path}")
-                    return {
-                        'type': 'audio',
-                        'content': audio_path,
-                        'video_id': video_id,
-                        'platform': platform
-                    }
-
-            # 下载新的音频文件
-            audio_path = str(self.download_dir / f'{video_id}.mp3')
-            # 先检查并删除可能存在的同名文件
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+            if video_info and video_info['audio_path'] and Path(video_info['audio_path']).exists():
+                audio_path = await asyncio.to_thread(
+                    self.audio_store.put, platform.value, video_id, video_info['audio_path'], pin
+                )
+                self.subtitle_manager.save_video_info(api_video_info, platform, audio_path=audio_path)
+        if audio_path:
+            print(f"找到现有音频文件: {audio_path}")
+            return {
+                'type': 'audio',
+                'content': audio_path,
+                'video_id': video_id,
+                'platform': platform
+            }
+
+        # 下载新的音频文件;下载得到的临时文件与存入音频存储后的文件分开记录,
+        # 失败时只清理临时文件,存储中的文件可能被其他视频共用
+        download_path = str(self.download_dir / f'{video_id}.mp3')
+        # 先检查并删除可能存在的同名文件
+        if os.path.exists(download_path):
+            os.remove(download_path)
 
-            try:
-                if platform == Platform.XIAOYUZHOU:
-                    # 使用小宇宙API处理
-                    episode_info = self.xiaoyuzhou_api._extract_episode_info(url)
-                    audio_path = self.xiaoyuzhou_api._download_audio(
-                        episode_info["audio_url"], 
-                        video_id
-                    )
-                    
-                    # 保存视频信息
-                    self.subtitle_manager.save_video_info(
-                        {
-                            'id': video_id,
-                            'title': episode_info['title'],
-                            'description': episode_info['description'],
-                            'url': url
-                        },
-                        platform,
-                        audio_path=audio_path
-                    )
-                    
-                    return {
-                        'type': 'audio',
-                        'content': audio_path,
-                        'video_id': video_id,
-                        'platform': platform,
-                        'title': episode_info['title']
-                    }
-                else:
-                    # 现有的B站和YouTube处理逻辑
-                    audio_path = api.download_audio(url, audio_path)
-                    # 验证下载的文件
-                    if not self._verify_downloaded_file(audio_path):
-                        raise Exception("下载完成但文件无效")
-
-                    print(f"音频下载完成: {audio_path}")
-
-                    # 保存视频信息
-                    print("保存视频信息...")
-                    self.subtitle_manager.save_video_info(
-                        api_video_info,
-                        platform,
-                        audio_path=audio_path
-                    )
-
-                    return {
-                        'type': 'audio',
-                        'content': audio_path,
-                        'video_id': video_id,
-                        'platform': platform
-                    }
+        try:
+            if platform == Platform.XIAOYUZHOU:
+                # 使用小宇宙API处理
+                episode_info = await asyncio.to_thread(self.xiaoyuzhou_api._extract_episode_info, url)
+                download_path = await asyncio.to_thread(
+                    self.xiaoyuzhou_api._download_audio,
+                    episode_info["audio_url"],
+                    video_id
+                )
+                audio_path = await asyncio.to_thread(
+                    self.audio_store.put, platform.value, video_id, download_path, pin
+                )
+                
+                # 保存视频信息
+                self.subtitle_manager.save_video_info(
+                    {
+                        'id': video_id,
+                        'title': episode_info['title'],
+                        'description': episode_info['description'],
+                        'url': url
+                    },
+                    platform,
+                    audio_path=audio_path
+                )
+                
+                return {
+                    'type': 'audio',
+                    'content': audio_path,
+                    'video_id': video_id,
+                    'platform': platform,
+                    'title': episode_info['title']
+                }
+            else:
+                # 现有的B站和YouTube处理逻辑
+                download_path = await asyncio.to_thread(api.download_audio, url, download_path)
+                # 验证下载的文件
+                if not self._verify_downloaded_file(download_path):
+                    raise Exception("下载完成但文件无效")
+
+                print(f"音频下载完成: {download_path}")
+                audio_path = await asyncio.to_thread(
+                    self.audio_store.put, platform.value, video_id, download_path, pin
+                )
+
+                # 保存视频信息
+                print("保存视频信息...")
+                self.subtitle_manager.save_video_info(
+                    api_video_info,
+                    platform,
+                    audio_path=audio_path
+                )
 
-            except Exception as e:
-                # 如果下载失败，清理可能存在的不完整文件
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
-                raise Exception(f"音频下载失败: {str(e)}")
+                return {
+                    'type': 'audio',
+                    'content': audio_path,
+                    'video_id': video_id,
+                    'platform': platform
+                }
 
         except Exception as e:
-            error_msg = f"下载失败: {str(e)}"
-            print(error_msg, file=sys.stderr)
-            raise
-
-    async def search_videos(self, keyword: str, platform: Platform, max_results: int = 200) -> List[Dict]:
-        """搜索视频
+            # 如果下载失败，清理可能存在的不完整文件;存入存储后临时文件已不存在
+            if os.path.exists(download_path):
+                os.remove(download_path)
+            if platform != Platform.XIAOYUZHOU:
+                # 保留原始音频流时文件扩展名由yt-dlp决定(m4a/webm,以及未完成的.part)
+                for partial_path in self.download_dir.glob(f'{video_id}.*'):
+                    partial_path.unlink(missing_ok=True)
+            if pin and audio_path:
+                self.audio_store.release(audio_path)
+            raise Exception(f"音频下载失败: {str(e)}")
+
+    async def search_videos(self, keyword: str, platform: Platform, max_results: int = 200,
+                            order: Optional[str] = None) -> List[Dict]:
+        """搜索视频,结果按 (平台, 关键词, 排序方式) 缓存
+        
+        缓存未超过 search_cache_ttl 时直接返回;超过但仍在 search_cache_stale_ttl 内时先返回旧结果,
+        同时在后台重新搜索;需要的结果多于缓存时,从缓存记录的下一页继续追加
         
         Args:
             keyword: 搜索关键词
             platform: 平台 (BILIBILI 或 YOUTUBE)
             max_results: 最大结果数量
+            order: 排序方式,默认使用平台的综合排序
             
         Returns:
             List[Dict]: 搜索结果列表
@@ -361,21 +510,193 @@ class AudioDownloader:
         """
         try:
             print(f"在{platform.value}上搜索视频: {keyword}")
-
-            if platform == Platform.YOUTUBE:
-                if not self.youtube_api:
-                    raise ValueError("YouTube API未初始化")
-                return self.youtube_api.search_videos(keyword, max_results)
-
-            elif platform == Platform.BILIBILI:
-                if not self.bili_api:
-                    raise ValueError("B站API未初始化")
-                return await self.bili_api.search_videos(keyword, max_results)
-
-            else:
+            if platform not in DEFAULT_SEARCH_ORDER:
                 raise ValueError(f"不支持的平台: {platform}")
+            order = order or DEFAULT_SEARCH_ORDER[platform]
+
+            ttl, stale_ttl = self._search_cache_ttls()
+            cached = self.subtitle_manager.get_cached_search(platform, keyword, order) if ttl else None
+            if cached:
+                age = (datetime.utcnow() - cached['fetch_time']).total_seconds()
+                if age < stale_ttl:
+                    # 不能按页追加时会从头搜索,结果已是最新
+                    refetched = False
+                    if len(cached['results']) < max_results and not cached['exhausted']:
+                        refetched = cached['next_page'] is None
+                        print(f"搜索缓存有 {len(cached['results'])} 个结果, 继续获取到 {max_results} 个...")
+                        cached = await self._fetch_search(
+                            platform, keyword, order, max_results, cached['results'], cached['next_page'],
+                            cached['fetch_time']
+                        )
+                    else:
+                        print(f"使用搜索缓存: {len(cached['results'])} 个结果, 缓存于 {age / 60:.0f} 分钟前")
+                    if age >= ttl and not refetched:
+                        self._revalidate_search(platform, keyword, order, max(len(cached['results']), max_results))
+                    return cached['results'][:max_results]
+
+            return (await self._fetch_search(platform, keyword, order, max_results))['results']
 
         except Exception as e:
             error_msg = f"搜索视频失败: {str(e)}"
             print(error_msg, file=sys.stderr)
             raise
+
+    @staticmethod
+    def _search_cache_ttls() -> tuple:
+        """搜索缓存的有效期和过期后仍可使用的时间(秒)"""
+        config_service = ConfigurationService()
+        ttl = config_service.get_config("system", "search_cache_ttl") or 0
+        stale_ttl = max(config_service.get_config("system", "search_cache_stale_ttl") or 0, ttl)
+        return ttl, stale_ttl
+
+    async def stream_search_videos(self, keyword: str, platform: Platform,
+                                   max_results: int = 200) -> AsyncIterator[Dict]:
+        """搜索视频并按排名逐个返回结果
+        
+        YouTube 没有可用缓存时边翻页边返回,调用方拿到第一页即可开始处理,搜索完成后写入缓存;
+        其他情况与 search_videos 相同,一次取得全部结果后逐个返回
+        
+        Args:
+            keyword: 搜索关键词
+            platform: 平台
+            max_results: 最大结果数量
+            
+        Yields:
+            Dict: 搜索结果
+        """
+        order = DEFAULT_SEARCH_ORDER.get(platform)
+        ttl, stale_ttl = self._search_cache_ttls()
+        cached = self.subtitle_manager.get_cached_search(platform, keyword, order) if ttl and order else None
+        if platform != Platform.YOUTUBE or (
+            cached and (datetime.utcnow() - cached['fetch_time']).total_seconds() < stale_ttl
+        ):
+            for video in await self.search_videos(keyword, platform, max_results):
+                yield video
+            return
+
+        print(f"在{platform.value}上搜索视频: {keyword}")
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        stop = threading.Event()
+
+        def produce():
+            # 在线程中迭代同步的搜索生成器,结果通过队列交给事件循环
+            try:
+                for video in self.youtube_api.iter_search(keyword, max_results):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, video)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+        producer = loop.run_in_executor(None, produce)
+        results = []
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    print(f"搜索视频失败: {str(item)}", file=sys.stderr)
+                    raise item
+                results.append(item)
+                yield item
+        finally:
+            stop.set()
+            await producer
+
+        if results and ttl:
+            self.subtitle_manager.save_cached_search(
+                platform, keyword, order, results, None, len(results) < max_results
+            )
+
+    async def _fetch_search(
+        self,
+        platform: Platform,
+        keyword: str,
+        order: str,
+        max_results: int,
+        existing: Optional[List[Dict]] = None,
+        next_page: Optional[int] = 1,
+        fetch_time: Optional[datetime] = None
+    ) -> Dict:
+        """请求平台搜索并写入缓存
+        
+        平台支持按页搜索且已知下一页时,只请求缺少的页并按视频ID去重后追加到 existing 之后;
+        否则从头搜索 max_results 个结果
+        
+        Args:
+            platform: 平台
+            keyword: 搜索关键词
+            order: 排序方式
+            max_results: 需要的结果总数
+            existing: 已缓存的结果
+            next_page: 继续请求的页码,为None时从头搜索
+            fetch_time: 已缓存结果的获取时间,追加时保持不变
+            
+        Returns:
+            Dict: 包含results、next_page、exhausted的字典
+        """
+        existing = existing or []
+        if platform == Platform.BILIBILI and next_page:
+            if not self.bili_api:
+                raise ValueError("B站API未初始化")
+            results = list(existing)
+            seen = {video['id'] for video in results}
+            page, exhausted = next_page, False
+            try:
+                while len(results) < max_results:
+                    page_videos = await self.bili_api.search_page(keyword, page, order)
+                    if page_videos is None:
+                        exhausted = True
+                        break
+                    # 翻页期间排名变化会让相邻两页出现重复视频
+                    new_videos = [video for video in page_videos if video['id'] not in seen]
+                    seen.update(video['id'] for video in new_videos)
+                    results.extend(new_videos)
+                    page += 1
+            except Exception as e:
+                # 已获取的页保留在缓存中,下次从失败的页继续
+                print(f"B站搜索失败: {str(e)}", file=sys.stderr)
+                if not results:
+                    print("出错后切换到备选搜索方法...")
+                    results = await self.bili_api.search_videos_old(keyword, max_results, order=order)
+                    page, exhausted = None, len(results) < max_results
+        elif platform == Platform.YOUTUBE:
+            if not self.youtube_api:
+                raise ValueError("YouTube API未初始化")
+            results = await self._call_api(self.youtube_api.search_videos, keyword, max_results)
+            page, exhausted, fetch_time = None, len(results) < max_results, None
+        else:
+            if not self.bili_api:
+                raise ValueError("B站API未初始化")
+            results = await self.bili_api.search_videos(keyword, max_results, order)
+            page, exhausted, fetch_time = None, len(results) < max_results, None
+
+        ttl, _ = self._search_cache_ttls()
+        if results and ttl:
+            # 空结果多半是请求失败,不缓存;search_cache_ttl 为0表示不缓存
+            self.subtitle_manager.save_cached_search(platform, keyword, order, results, page, exhausted, fetch_time)
+        # 按页获取时最后一页可能超出需要的数量,缓存保留整页,返回时截断
+        return {'results': results[:max_results], 'next_page': page, 'exhausted': exhausted}
+
+    def _revalidate_search(self, platform: Platform, keyword: str, order: str, max_results: int):
+        """在后台重新搜索以刷新过期缓存,同一搜索只启动一个任务"""
+        key = (platform, keyword.strip().lower(), order)
+        task = self._search_revalidations.get(key)
+        if task and not task.done():
+            return
+
+        async def revalidate():
+            try:
+                print(f"后台刷新搜索缓存 [{platform.value}] {keyword}")
+                await self._fetch_search(platform, keyword, order, max_results)
+            except Exception as e:
+                print(f"后台刷新搜索缓存失败: {str(e)}")
+            finally:
+                self._search_revalidations.pop(key, None)
+
+        self._search_revalidations[key] = asyncio.create_task(revalidate())
@@ -0,0 +1,154 @@
+from typing import Dict, Tuple
+
+from services.bili2text.core.model_cache import ModelKey
+
+# 可选的推理引擎
+ENGINE_OPENAI = "openai"                  # openai-whisper原生PyTorch模型
+ENGINE_INT8 = "int8"                      # PyTorch动态int8量化,仅CPU
+ENGINE_FASTER_WHISPER = "faster_whisper"  # CTranslate2后端(需安装faster-whisper)
+
+ENGINES = (ENGINE_OPENAI, ENGINE_INT8, ENGINE_FASTER_WHISPER)
+
+# 各模型的近似参数量,用于估算没有PyTorch参数的模型占用
+MODEL_PARAMS = {
+    "tiny": 39_000_000,
+    "base": 74_000_000,
+    "small": 244_000_000,
+    "medium": 769_000_000,
+    "large": 1_550_000_000,
+}
+
+
+def resolve_model_key(model_name: str, engine: str, cuda_available: bool) -> ModelKey:
+    """根据引擎和硬件确定模型缓存键
+
+    Args:
+        model_name: 模型名称
+        engine: 推理引擎
+        cuda_available: 是否有可用的CUDA设备
+
+    Returns:
+        ModelKey: 模型缓存键
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"不支持的推理引擎: {engine}")
+    if engine == ENGINE_INT8:
+        return ModelKey(model_name, "cpu", "int8", engine)
+    if engine == ENGINE_FASTER_WHISPER:
+        if cuda_available:
+            return ModelKey(model_name, "cuda", "float16", engine)
+        return ModelKey(model_name, "cpu", "int8", engine)
+    if cuda_available:
+        return ModelKey(model_name, "cuda", "fp16", engine)
+    return ModelKey(model_name, "cpu", "fp32", engine)
+
+
+def load_engine_model(whisper, key: ModelKey):
+    """按模型缓存键加载对应引擎的模型
+
+    所有引擎返回的模型都提供与openai-whisper一致的 transcribe(audio, **options) 接口
+
+    Args:
+        whisper: 已导入的whisper模块
+        key: 模型缓存键
+
+    Returns:
+        加载完成的模型
+    """
+    if key.engine == ENGINE_FASTER_WHISPER:
+        return FasterWhisperModel(key)
+
+    model = whisper.load_model(key.model_name, device=key.device)
+    if key.engine == ENGINE_INT8:
+        model = quantize_int8(whisper, model)
+    return model
+
+
+def detect_language(whisper, model, audio) -> Tuple[str, float]:
+    """识别音频前30秒的语言
+
+    Args:
+        whisper: 已导入的whisper模块
+        model: 任意引擎加载的多语言模型
+        audio: 16kHz的PCM数组
+
+    Returns:
+        Tuple[str, float]: (语言代码, 置信度)
+    """
+    if isinstance(model, FasterWhisperModel):
+        return model.detect_language(audio)
+
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    language = max(probs, key=probs.get)
+    return language, probs[language]
+
+
+def quantize_int8(whisper, model):
+    """对whisper模型的线性层做动态int8量化
+
+    whisper自定义的Linear子类无法被quantize_dynamic识别,先还原为torch.nn.Linear再量化
+
+    Args:
+        whisper: 已导入的whisper模块
+        model: CPU上的whisper模型
+
+    Returns:
+        量化后的模型
+    """
+    torch = whisper.torch
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class FasterWhisperModel:
+    """CTranslate2后端的适配器,对外提供与openai-whisper相同的transcribe结果结构"""
+
+    def __init__(self, key: ModelKey):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError("使用faster_whisper引擎需要安装faster-whisper: pip install faster-whisper") from e
+
+        self.model = WhisperModel(key.model_name, device=key.device, compute_type=key.precision)
+        bytes_per_param = 1 if key.precision.startswith("int8") else 2
+        self.size_bytes = MODEL_PARAMS.get(key.model_name.split(".")[0], 0) * bytes_per_param
+
+    def detect_language(self, audio) -> Tuple[str, float]:
+        """识别音频前30秒的语言,返回 (语言代码, 置信度)"""
+        # transcribe在返回前即完成语言识别,片段生成器是惰性的,不迭代就不会解码
+        _, info = self.model.transcribe(audio[:30 * 16000], beam_size=1)
+        return info.language, info.language_probability
+
+    def transcribe(self, audio, **options) -> Dict:
+        """转录音频,参数与openai-whisper的transcribe一致(fp16/verbose会被忽略)"""
+        verbose = options.pop("verbose", None)
+        options.pop("fp16", None)
+        if options.get("beam_size") is None:
+            options["beam_size"] = 1
+
+        segments_iter, info = self.model.transcribe(audio, **options)
+        segments = []
+        for segment in segments_iter:
+            segments.append({
+                "id": len(segments),
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": getattr(segment, "temperature", None),
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+            })
+            if verbose:
+                print(f"[{segment.start:.2f} --> {segment.end:.2f}] {segment.text}")
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language,
+        }
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.config_service import ConfigurationService
+
+
+class AsyncHttpClient:
+    """平台API共用的异步HTTP客户端
+
+    基于 httpx.AsyncClient,连接保持复用,安装了h2时使用HTTP/2;
+    除连接池总上限外,每个主机的并发请求数单独限制,避免单个平台占满连接池
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_per_host: int = 10,
+        timeout: float = 15,
+        connect_timeout: float = 5
+    ):
+        """初始化HTTP客户端
+
+        Args:
+            max_connections: 连接池总连接数上限
+            max_per_host: 每个主机的并发请求数上限
+            timeout: 读写超时(秒)
+            connect_timeout: 连接超时(秒)
+        """
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+
+        self.max_per_host = max_per_host
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            follow_redirects=True
+        )
+        print(f"HTTP客户端已创建 (HTTP/2: {'启用' if http2 else '未安装h2,使用HTTP/1.1'})")
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_semaphores[host]
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """发送请求,参数同 httpx.AsyncClient.request"""
+        async with self._host_semaphore(url):
+            return await self._client.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: Optional[AsyncHttpClient] = None
+
+
+def get_http_client() -> AsyncHttpClient:
+    """获取共享的HTTP客户端,首次调用时按 system 配置创建"""
+    global _client
+    if _client is None:
+        config_service = ConfigurationService()
+        _client = AsyncHttpClient(
+            max_connections=config_service.get_config("system", "http_max_connections") or 100,
+            max_per_host=config_service.get_config("system", "http_max_per_host") or 10,
+            timeout=config_service.get_config("system", "http_timeout") or 15
+        )
+    return _client
+
+
+async def close_http_client():
+    """关闭共享的HTTP客户端,服务退出时调用"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,182 @@
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+
+# 连接超时和两次读取之间的超时(秒),流式下载不限制总时长
+DEFAULT_TIMEOUT = (10, 60)
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+
+class IncompleteDownloadError(Exception):
+    """下载的字节数与Content-Length不一致"""
+
+
+def probe_remote_file(url: str, headers: Dict, timeout=DEFAULT_TIMEOUT) -> Tuple[Optional[int], bool]:
+    """获取远程文件大小以及是否支持Range请求
+
+    Args:
+        url: 文件URL
+        headers: 请求头
+        timeout: 超时设置
+
+    Returns:
+        Tuple[Optional[int], bool]: (文件大小, 是否支持Range),大小未知时为None
+    """
+    # 部分CDN不支持HEAD,用只取第一个字节的Range请求探测
+    with requests.get(url, headers={**headers, 'Range': 'bytes=0-0'}, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        if response.status_code == 206:
+            content_range = response.headers.get('Content-Range', '')
+            total = content_range.rsplit('/', 1)[-1]
+            return (int(total) if total.isdigit() else None), True
+        length = response.headers.get('Content-Length')
+        return (int(length) if length else None), False
+
+
+def _download_range(
+    url: str,
+    path: str,
+    headers: Dict,
+    start: int = 0,
+    end: Optional[int] = None,
+    chunk_size: int = 1024 * 1024,
+    max_retries: int = 5,
+    timeout=DEFAULT_TIMEOUT
+) -> int:
+    """把 [start, end] 字节区间流式写入文件,断线后从已写入的位置继续
+
+    Args:
+        url: 文件URL
+        path: 目标文件,已存在时视为之前中断的部分
+        headers: 请求头
+        start: 起始字节
+        end: 结束字节(包含),为None表示到文件末尾
+        chunk_size: 每次写入的块大小
+        max_retries: 连续失败的最大重试次数
+        timeout: 超时设置
+
+    Returns:
+        int: 已写入的字节数
+    """
+    failures = 0
+    while True:
+        written = os.path.getsize(path) if os.path.exists(path) else 0
+        if end is not None and start + written > end:
+            return written
+
+        attempt_written = written
+        range_headers = dict(headers)
+        if start + written > 0 or end is not None:
+            range_headers['Range'] = f"bytes={start + written}-{'' if end is None else end}"
+
+        try:
+            with requests.get(url, headers=range_headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416:
+                    # 请求的起点已超出文件末尾,说明之前已下载完整
+                    return written
+                response.raise_for_status()
+                mode = 'ab'
+                if 'Range' in range_headers and response.status_code != 206:
+                    # 服务器忽略了Range,只能从头下载
+                    if start > 0 or end is not None:
+                        raise IncompleteDownloadError("服务器不支持Range请求,无法分段下载")
+                    mode = 'wb'
+                    written = 0
+
+                with open(path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                return written
+
+        except RETRYABLE_ERRORS as e:
+            if written > attempt_written:
+                # 本次请求有进展,只统计连续失败
+                failures = 0
+            failures += 1
+            if failures > max_retries:
+                raise
+            delay = min(2 ** failures, 30)
+            print(f"下载中断({str(e)}), 已写入 {written / 1024 / 1024:.1f}MB, {delay}秒后续传...")
+            time.sleep(delay)
+
+
+def download_file(
+    url: str,
+    output_path: str,
+    headers: Optional[Dict] = None,
+    chunk_size: int = 1024 * 1024,
+    parallel_parts: int = 1,
+    parallel_threshold: int = 64 * 1024 * 1024,
+    max_retries: int = 5,
+    timeout=DEFAULT_TIMEOUT
+) -> str:
+    """流式下载文件到临时文件,完成并校验大小后原子地重命名为目标文件
+
+    临时文件在失败后保留,再次调用时通过Range请求续传
+
+    Args:
+        url: 文件URL
+        output_path: 目标文件路径
+        headers: 请求头
+        chunk_size: 每次写入的块大小
+        parallel_parts: 大文件并行下载的分段数,1表示不并行
+        parallel_threshold: 启用并行下载的最小文件大小(字节)
+        max_retries: 每段连续失败的最大重试次数
+        timeout: 超时设置
+
+    Returns:
+        str: 目标文件路径
+
+    Raises:
+        IncompleteDownloadError: 下载大小与Content-Length不一致
+    """
+    # 压缩传输时Content-Length与写入的字节数不一致,Range偏移也会错位
+    headers = {**(headers or {}), 'Accept-Encoding': 'identity'}
+    tmp_path = f"{output_path}.part"
+    total_size, accepts_ranges = probe_remote_file(url, headers, timeout)
+
+    if accepts_ranges and total_size and parallel_parts > 1 and total_size >= parallel_threshold:
+        print(f"文件大小 {total_size / 1024 / 1024:.1f}MB, 分 {parallel_parts} 段并行下载")
+        part_size = -(-total_size // parallel_parts)
+        ranges = [
+            (index, index * part_size, min((index + 1) * part_size, total_size) - 1)
+            for index in range(parallel_parts)
+        ]
+        with ThreadPoolExecutor(max_workers=parallel_parts) as executor:
+            futures = [
+                executor.submit(_download_range, url, f"{tmp_path}{index}", headers, start, end,
+                                chunk_size, max_retries, timeout)
+                for index, start, end in ranges
+            ]
+            for future in futures:
+                future.result()
+
+        with open(tmp_path, 'wb') as output:
+            for index, _, _ in ranges:
+                with open(f"{tmp_path}{index}", 'rb') as part:
+                    shutil.copyfileobj(part, output, chunk_size)
+        for index, _, _ in ranges:
+            os.remove(f"{tmp_path}{index}")
+    else:
+        if not accepts_ranges and os.path.exists(tmp_path):
+            # 无法续传时旧的临时文件没有意义
+            os.remove(tmp_path)
+        _download_range(url, tmp_path, headers, chunk_size=chunk_size, max_retries=max_retries, timeout=timeout)
+
+    actual_size = os.path.getsize(tmp_path)
+    if total_size is not None and actual_size != total_size:
+        os.remove(tmp_path)
+        raise IncompleteDownloadError(f"下载不完整: 期望 {total_size} 字节, 实际 {actual_size} 字节")
+
+    os.replace(tmp_path, output_path)
+    return output_path
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+
+class ModelKey(NamedTuple):
+    """模型缓存键"""
+    model_name: str
+    device: str
+    precision: str
+    engine: str = "openai"
+
+
+def _tensor_bytes(value) -> int:
+    """统计张量或张量元组占用的字节数,其他值计为0"""
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    if hasattr(value, "numel") and hasattr(value, "element_size"):
+        return value.numel() * value.element_size()
+    return 0
+
+
+def model_size_bytes(model) -> int:
+    """估算模型参数与缓冲区占用的字节数"""
+    # 非PyTorch模型(如CTranslate2)自行提供估算值
+    if hasattr(model, "size_bytes"):
+        return model.size_bytes
+    # 动态int8量化的Linear层把权重打包在 _packed_params 中,不在 parameters() 里,
+    # 按 state_dict 统计才能计入;打包参数以 (权重, 偏置) 元组的形式出现
+    return sum(_tensor_bytes(value) for value in model.state_dict(keep_vars=True).values())
+
+
+class ModelCache:
+    """模型缓存,按 (model_name, device, precision, engine) 缓存已加载的模型,超出内存预算时按LRU淘汰
+
+    whisper模型在解码时会挂载kv-cache钩子,同一个模型实例不能被多个线程同时使用,
+    因此每次转录都通过 acquire 独占一个副本;同一模型并发使用时会加载额外副本。
+    正在使用的副本不会被淘汰。
+    """
+
+    def __init__(self, loader: Callable[[ModelKey], Any], memory_budget_mb: int):
+        """初始化模型缓存
+
+        Args:
+            loader: 根据ModelKey加载模型的函数
+            memory_budget_mb: 内存预算(MB)
+        """
+        self._loader = loader
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        # 空闲副本,按最近使用顺序排列(末尾为最近使用)
+        self._idle: "OrderedDict[Tuple[ModelKey, int], Any]" = OrderedDict()
+        self._sizes: Dict[Tuple[ModelKey, int], int] = {}
+        self._next_replica = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def total_bytes(self) -> int:
+        """当前缓存(含使用中)的模型总字节数"""
+        return sum(self._sizes.values())
+
+    @contextmanager
+    def acquire(self, key: ModelKey):
+        """独占获取一个模型副本,使用完毕后归还缓存
+
+        Args:
+            key: 模型缓存键
+        """
+        entry, model = self._checkout(key)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self._idle[entry] = model
+                self._evict_locked()
+
+    def _checkout(self, key: ModelKey) -> Tuple[Tuple[ModelKey, int], Any]:
+        """取出一个空闲副本,没有时加载新副本"""
+        with self._lock:
+            for entry in reversed(self._idle):
+                if entry[0] == key:
+                    self.hits += 1
+                    return entry, self._idle.pop(entry)
+            self.misses += 1
+            entry = (key, self._next_replica)
+            self._next_replica += 1
+
+        # 加载模型耗时较长,不持有锁
+        start_time = time.time()
+        model = self._loader(key)
+        size = model_size_bytes(model)
+        print(f"模型 {key.model_name}({key.device}/{key.precision}) 已加入缓存, "
+              f"大小 {size / 1024 / 1024:.0f}MB, 耗时 {time.time() - start_time:.2f}秒")
+
+        with self._lock:
+            self._sizes[entry] = size
+            self._evict_locked()
+        return entry, model
+
+    def _evict_locked(self):
+        """淘汰最久未使用的空闲副本,直到总大小不超过预算"""
+        while self.total_bytes > self.memory_budget and self._idle:
+            entry, _ = self._idle.popitem(last=False)
+            size = self._sizes.pop(entry)
+            print(f"模型缓存超出预算,淘汰模型 {entry[0].model_name}({entry[0].device}/{entry[0].precision}), "
+                  f"释放 {size / 1024 / 1024:.0f}MB")
+
+    def keys(self) -> List[ModelKey]:
+        """当前缓存中的模型键(去重)"""
+        with self._lock:
+            return list(dict.fromkeys(entry[0] for entry in self._sizes))
+
+    def clear(self):
+        """清空所有空闲副本"""
+        with self._lock:
+            for entry in list(self._idle):
+                del self._idle[entry]
+                self._sizes.pop(entry, None)
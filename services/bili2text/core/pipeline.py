@@ -0,0 +1,315 @@
+import asyncio
+import math
+import sys
+from typing import AsyncIterable, Awaitable, Callable, Dict, List, Optional, Union
+
+from db.models.subtitle import Platform
+from services.bili2text.core.audio_utils import probe_duration
+from services.bili2text.core.transcriber import segment_collector
+from services.config_service import ConfigurationService
+
+# 流水线阶段,按处理顺序排列;视频只会流向后面的阶段
+STAGES = ("metadata", "subtitle", "download", "transcribe", "summary")
+
+
+class BatchPipeline:
+    """批量处理流水线:元数据 → 官方字幕 → 下载 → 转写 → 总结
+
+    每个阶段有独立的worker数和有界队列,下游处理不过来时上游会在入队处等待,
+    下载和转写因此可以重叠进行,网络和CPU都保持忙碌。
+    短于 whisper.batch_max_duration 的音频在转写阶段攒成小批次,通过 transcribe_batch 合并解码,
+    攒够 whisper.batch_size 个30秒窗口或等待 system.pipeline_batch_wait 秒后提交
+    """
+
+    def __init__(self, processor, topic: str, keyword: str, platform: Platform, cascade: bool = False):
+        """初始化流水线
+
+        Args:
+            processor: VideoProcessor实例,提供下载器、转写器和字幕管理器
+            topic: 主题
+            keyword: 搜索关键词
+            platform: 平台
+            cascade: 是否先用小模型预览判断相关性
+        """
+        self.processor = processor
+        self.downloader = processor.downloader
+        self.transcriber = processor.transcriber
+        self.subtitle_manager = processor.subtitle_manager
+        self.topic = topic
+        self.keyword = keyword
+        self.platform = platform
+        self.cascade = cascade
+
+        config_service = ConfigurationService()
+        workers = config_service.get_config("system", "pipeline_workers") or {}
+        # 下载和转写阶段默认与对应的并发上限一致
+        defaults = {
+            "download": config_service.get_config("system", "max_concurrent_downloads") or 1,
+            "transcribe": config_service.get_config("system", "max_concurrent_transcriptions") or 1,
+        }
+        self.workers = {stage: workers.get(stage) or defaults.get(stage, 1) for stage in STAGES}
+        queue_size = config_service.get_config("system", "pipeline_queue_size") or 0
+        self.queues: Dict[str, asyncio.Queue] = {stage: asyncio.Queue(maxsize=queue_size) for stage in STAGES}
+
+        self.batch_max_duration = config_service.get_config("whisper", "batch_max_duration") or 0
+        self.batch_windows = config_service.get_config("whisper", "batch_size") or 8
+        self.batch_wait = config_service.get_config("system", "pipeline_batch_wait") or 2
+        self._batch_pending: List[Dict] = []
+        self._batch_pending_windows = 0
+        self._batch_timer: Optional[asyncio.Task] = None
+        self._batch_tasks: List[asyncio.Task] = []
+
+        self.total = 0
+        self.completed = 0
+        self.results: Dict[int, Dict] = {}
+
+    async def run(self, videos: Union[List[Dict], AsyncIterable[Dict]]) -> List[Dict]:
+        """运行流水线直到所有视频处理完成
+
+        Args:
+            videos: 搜索结果列表,或边搜索边返回结果的异步迭代器;后者在拿到第一个结果时即开始处理
+
+        Returns:
+            List[Dict]: 按搜索排名排列的处理结果,跳过和失败的视频不包含在内
+        """
+        handlers: Dict[str, Callable[[Dict], Awaitable[Optional[str]]]] = {
+            "metadata": self._check_existing,
+            "subtitle": self._fetch_subtitle,
+            "download": self._download,
+            "transcribe": self._transcribe,
+            "summary": self._summarize,
+        }
+        print("流水线worker数: " + ", ".join(f"{stage}={self.workers[stage]}" for stage in STAGES))
+        tasks = [
+            asyncio.create_task(self._worker(stage, handlers[stage]))
+            for stage in STAGES
+            for _ in range(self.workers[stage])
+        ]
+
+        try:
+            if isinstance(videos, list):
+                self.total = len(videos)
+                for rank, video in enumerate(videos, 1):
+                    await self.queues["metadata"].put({'rank': rank, 'video': video, 'video_id': video['id']})
+            else:
+                # 结果总数在搜索结束前未知,按已收到的数量显示进度
+                try:
+                    async for video in videos:
+                        self.total += 1
+                        await self.queues["metadata"].put({'rank': self.total, 'video': video, 'video_id': video['id']})
+                except Exception as e:
+                    if not self.total:
+                        raise
+                    # 后续页搜索失败时不再加入新视频,已加入的视频继续处理完
+                    print(f"搜索中断,继续处理已获取的 {self.total} 个视频: {str(e)}", file=sys.stderr)
+
+            # 视频只流向后面的阶段,上游排空后下游不会再有新视频
+            for stage in STAGES:
+                await self.queues[stage].join()
+                if stage == "transcribe":
+                    # 攒批中的短音频在转写完成后才进入总结阶段
+                    await self._drain_batches()
+        finally:
+            for task in tasks + self._batch_tasks:
+                task.cancel()
+            if self._batch_timer:
+                self._batch_timer.cancel()
+            await asyncio.gather(*tasks, *self._batch_tasks, return_exceptions=True)
+            # 中途退出时,已下载但还没转写的音频不再需要固定
+            while not self.queues["transcribe"].empty():
+                self._release_audio(self.queues["transcribe"].get_nowait())
+            for item in self._batch_pending:
+                self._release_audio(item)
+
+        return [self.results[rank] for rank in sorted(self.results)]
+
+    async def _worker(self, stage: str, handler: Callable[[Dict], Awaitable[Optional[str]]]):
+        """阶段worker:处理视频并交给handler返回的下一阶段,返回None表示处理结束"""
+        queue = self.queues[stage]
+        while True:
+            item = await queue.get()
+            try:
+                next_stage = await handler(item)
+                if next_stage:
+                    await self.queues[next_stage].put(item)
+            except Exception as e:
+                video_title = f"「{item['video']['title']}」" if 'title' in item['video'] else ''
+                print(f"处理视频失败 [{self.platform.value}] {item['video_id']} {video_title} ({stage}): {str(e)}",
+                      file=sys.stderr)
+            finally:
+                queue.task_done()
+
+    async def _check_existing(self, item: Dict) -> Optional[str]:
+        """检查数据库中是否已有字幕"""
+        video_title = f"「{item['video']['title']}」" if 'title' in item['video'] else ''
+        print(f"处理第 {item['rank']}/{self.total} 个视频 [{self.platform.value}] {item['video_id']} {video_title}")
+
+        item['video_info'] = self.subtitle_manager.get_video_info(self.platform, item['video_id'])
+        existing_subtitle = self.subtitle_manager.get_subtitle(item['video_id'])
+        if existing_subtitle:
+            print(f"找到现有字幕 [{self.platform.value}] {item['video_id']} {video_title}")
+            item['result'] = {
+                'type': 'subtitle',
+                'content': existing_subtitle['content'],
+                'video_id': item['video_id'],
+                'transcribe_task': None
+            }
+            return "summary"
+        return "subtitle"
+
+    async def _fetch_subtitle(self, item: Dict) -> Optional[str]:
+        """请求平台API获取官方字幕"""
+        url = self.processor._get_video_url(item['video_id'], self.platform)
+        fetched = await self.downloader.fetch_official_subtitle(
+            self.topic, url, item['video_id'], self.platform, item['video_info']
+        )
+        if fetched['type'] == 'subtitle':
+            item['result'] = {**fetched, 'transcribe_task': None}
+            return "summary"
+        item['video_info'] = fetched['video_info']
+        return "download"
+
+    async def _download(self, item: Dict) -> Optional[str]:
+        """下载音频,音频在转写完成前固定在音频存储中,不会被淘汰"""
+        if self.cascade:
+            # 之前的运行中预览判断为无关的视频不再下载
+            recorded = self.subtitle_manager.get_preview_relevance(self.platform, item['video_id'], self.topic)
+            if recorded is not None and not recorded['association']:
+                print(f"视频 {item['video_id']} 此前已判断与主题 '{self.topic}' 无关,跳过")
+                self.subtitle_manager.update_video_search_info(item['video_id'], self.keyword, item['rank'], 'search')
+                return None
+
+        url = self.processor._get_video_url(item['video_id'], self.platform)
+        async with self.downloader.download_slot(self.platform):
+            downloaded = await self.downloader.download_audio_file(
+                url, item['video_id'], self.platform, item['video_info'], pin=True
+            )
+        item['audio_path'] = downloaded['content']
+        item['audio_pinned'] = True
+        return "transcribe"
+
+    def _release_audio(self, item: Dict):
+        """释放下载阶段固定的音频"""
+        if item.pop('audio_pinned', False):
+            self.downloader.audio_store.release(item['audio_path'])
+
+    async def _transcribe(self, item: Dict) -> Optional[str]:
+        """转写音频,级联模式下先判断相关性"""
+        batched = False
+        try:
+            if self.cascade:
+                preview = {'content': item['audio_path'], 'video_id': item['video_id']}
+                if not await self.processor._is_relevant_preview(self.topic, preview, self.platform):
+                    self.subtitle_manager.update_video_search_info(
+                        item['video_id'], self.keyword, item['rank'], 'search'
+                    )
+                    return None
+
+            if self.batch_max_duration:
+                duration = await asyncio.to_thread(probe_duration, item['audio_path'])
+                if duration is not None and duration <= self.batch_max_duration:
+                    # 批次转写完成后再释放
+                    self._add_to_batch(item, duration)
+                    batched = True
+                    return None
+
+            # 长音频单独转写,可使用分块并行、流式等长音频模式;流式模式下片段随窗口提交写入结果
+            segments = []
+            content = await self.transcriber.transcribe_file(
+                self.topic, item['audio_path'], item['video_id'], self.platform,
+                on_segments=segment_collector(segments, f"[{self.platform.value}] {item['video_id']}")
+            )
+        finally:
+            if not batched:
+                self._release_audio(item)
+        item['result'] = {
+            'type': 'audio',
+            'content': content,
+            'segments': segments,
+            'video_id': item['video_id'],
+            'transcribe_task': None
+        }
+        return "summary"
+
+    def _add_to_batch(self, item: Dict, duration: float):
+        """把短音频加入当前批次,窗口数攒够时立即提交,否则等待 batch_wait 秒后提交"""
+        self._batch_pending.append(item)
+        self._batch_pending_windows += max(1, math.ceil(duration / 30))
+        if self._batch_pending_windows >= self.batch_windows:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.create_task(self._flush_batch_later())
+
+    async def _flush_batch_later(self):
+        await asyncio.sleep(self.batch_wait)
+        self._batch_timer = None
+        self._flush_batch()
+
+    def _flush_batch(self):
+        """提交当前批次"""
+        if self._batch_timer is not None and self._batch_timer is not asyncio.current_task():
+            self._batch_timer.cancel()
+        self._batch_timer = None
+        if not self._batch_pending:
+            return
+        items, self._batch_pending, self._batch_pending_windows = self._batch_pending, [], 0
+        self._batch_tasks.append(asyncio.create_task(self._transcribe_batch(items)))
+
+    async def _drain_batches(self):
+        """提交剩余的批次并等待所有批次转写完成"""
+        self._flush_batch()
+        while self._batch_tasks:
+            tasks, self._batch_tasks = self._batch_tasks, []
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _transcribe_batch(self, items: List[Dict]):
+        """批量转写短音频,成功的视频交给总结阶段"""
+        print(f"批量转写 {len(items)} 个短音频")
+        try:
+            texts = await self.transcriber.transcribe_batch(self.topic, [
+                {'audio_path': item['audio_path'], 'video_id': item['video_id'], 'platform': self.platform}
+                for item in items
+            ])
+        except Exception as e:
+            print(f"批量转写失败 [{self.platform.value}]: {str(e)}", file=sys.stderr)
+            return
+        finally:
+            for item in items:
+                self._release_audio(item)
+
+        for item, content in zip(items, texts):
+            if content is None:
+                print(f"处理视频失败 [{self.platform.value}] {item['video_id']} (transcribe)", file=sys.stderr)
+                continue
+            item['result'] = {
+                'type': 'audio',
+                'content': content,
+                'video_id': item['video_id'],
+                'transcribe_task': None
+            }
+            await self.queues["summary"].put(item)
+
+    async def _summarize(self, item: Dict) -> Optional[str]:
+        """记录结果并生成字幕总结"""
+        video_info = self.subtitle_manager.get_video_info(self.platform, item['video_id'])
+        if video_info:
+            item['result']['title'] = video_info.get('title', '')
+        self.subtitle_manager.update_video_search_info(item['video_id'], self.keyword, item['rank'], 'search')
+        self.results[item['rank']] = item['result']
+
+        if item['result'].get('content'):
+            subtitle = self.subtitle_manager.get_subtitle(item['video_id'])
+            if subtitle and subtitle.get('id'):
+                print(f"开始处理视频 {item['video_id']} 的字幕总结任务")
+                try:
+                    await self.subtitle_manager.process_subtitle_summary(
+                        topic=self.topic,
+                        subtitle_id=subtitle['id'],
+                        content=subtitle['content']
+                    )
+                except Exception as e:
+                    print(f"视频 {item['video_id']} 的字幕总结失败: {str(e)}")
+
+        self.completed += 1
+        print(f"进度: {self.completed}/{self.total}")
+        return None
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from services.config_service import ConfigurationService
+
+# 表示触发平台限流的HTTP状态码
+THROTTLE_STATUS_CODES = (412, 429)
+
+# 未配置的平台和接口使用的默认限速
+DEFAULT_LIMIT = {"rate": 1.0, "burst": 1, "jitter": 0.2}
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    令牌按 rate 个/秒补充,最多积累 burst 个。取令牌时如果桶已空,直接预约下一个令牌,
+    并发的调用方因此依次排队而不是同时醒来;预约可以跨线程和协程共享。
+    触发限流后速率按 backoff 降低并暂停 cooldown 秒,令牌从暂停结束时才开始补充,
+    暂停期间排队的请求在暂停结束后仍按降低后的速率依次发出;之后每次成功请求逐步恢复速率。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        jitter: float = 0.0,
+        backoff: float = 0.5,
+        min_factor: float = 0.05,
+        cooldown: float = 30,
+        recovery: float = 1.1
+    ):
+        """初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量,允许的突发请求数
+            jitter: 随机抖动,等待时间额外增加 0~jitter 个请求间隔
+            backoff: 触发限流时速率乘以的系数
+            min_factor: 速率最低降到配置值的比例
+            cooldown: 触发限流后暂停请求的秒数
+            recovery: 每次成功请求后速率系数乘以的值,直到恢复为1
+        """
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.backoff = backoff
+        self.min_factor = min_factor
+        self.cooldown = cooldown
+        self.recovery = recovery
+        self.factor = 1.0
+        self._tokens = float(burst)
+        # 开始补充令牌的时间,暂停期间位于将来
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def effective_rate(self) -> float:
+        return self.rate * self.factor
+
+    def _refill_locked(self, now: float):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.effective_rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """取一个令牌
+
+        Returns:
+            float: 调用方需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            self._tokens -= 1
+            # 暂停剩余时间与令牌欠额叠加,暂停结束后排队的请求不会同时发出
+            delay = max(self._updated - now, 0.0) + max(-self._tokens, 0.0) / self.effective_rate
+        if self.jitter:
+            delay += random.uniform(0, self.jitter) / self.effective_rate
+        return delay
+
+    def slow_down(self):
+        """触发限流:降低速率并暂停一段时间,暂停结束前不补充令牌"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            self.factor = max(self.factor * self.backoff, self.min_factor)
+            # 暂停结束时只允许一个请求立即发出,之前预约的欠额保留
+            self._tokens = min(self._tokens, 1.0)
+            self._updated = max(self._updated, now + self.cooldown)
+
+    def speed_up(self):
+        """请求成功:逐步恢复速率"""
+        with self._lock:
+            if self.factor < 1.0:
+                self._refill_locked(time.monotonic())
+                self.factor = min(self.factor * self.recovery, 1.0)
+
+
+class RateLimiter:
+    """按 (平台, 接口) 共享请求预算的限速服务
+
+    限速参数来自 system.rate_limits,格式为 {平台: {接口: {rate, burst, jitter, ...}}},
+    接口未配置时使用该平台的 default 配置。同一接口的所有协程和线程共用一个令牌桶。
+    """
+
+    def __init__(self, limits: Optional[Dict] = None):
+        """初始化限速服务
+
+        Args:
+            limits: 各平台各接口的限速配置
+        """
+        self.limits = limits or {}
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, platform: str, endpoint: str = "default") -> TokenBucket:
+        """获取接口对应的令牌桶,首次使用时按配置创建"""
+        key = (platform, endpoint)
+        with self._lock:
+            if key not in self._buckets:
+                platform_limits = self.limits.get(platform, {})
+                options = {**DEFAULT_LIMIT, **platform_limits.get("default", {}), **platform_limits.get(endpoint, {})}
+                self._buckets[key] = TokenBucket(**options)
+            return self._buckets[key]
+
+    async def acquire(self, platform: str, endpoint: str = "default"):
+        """等待直到可以发送请求
+
+        Args:
+            platform: 平台
+            endpoint: 接口名称
+        """
+        delay = self.bucket(platform, endpoint).reserve()
+        if delay > 0:
+            print(f"[{platform}/{endpoint}] 等待 {delay:.1f} 秒以控制请求频率...")
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, platform: str, endpoint: str = "default"):
+        """acquire 的阻塞版本,供在线程中运行的同步API使用"""
+        delay = self.bucket(platform, endpoint).reserve()
+        if delay > 0:
+            print(f"[{platform}/{endpoint}] 等待 {delay:.1f} 秒以控制请求频率...")
+            time.sleep(delay)
+
+    def report(self, platform: str, endpoint: str = "default", status_code: Optional[int] = None):
+        """反馈请求结果,被限流时降速,成功时逐步恢复
+
+        Args:
+            platform: 平台
+            endpoint: 接口名称
+            status_code: HTTP状态码
+        """
+        bucket = self.bucket(platform, endpoint)
+        if status_code in THROTTLE_STATUS_CODES:
+            bucket.slow_down()
+            print(f"[{platform}/{endpoint}] 触发限流({status_code}), "
+                  f"速率降至 {bucket.effective_rate:.3f} 次/秒, 暂停 {bucket.cooldown:.0f} 秒")
+        elif status_code is None or status_code < 400:
+            bucket.speed_up()
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取共享的限速服务,首次调用时按 system 配置创建"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(ConfigurationService().get_config("system", "rate_limits"))
+        return _limiter
@@ -1,15 +1,16 @@
-import os
 import sys
 import uuid
 from contextlib import contextmanager
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, List, Union
 import re
 import asyncio
+import hashlib
 
 from db.init.base import get_db
-from db.models.subtitle import Video, Subtitle, SubtitleSource, Platform, SubtitleSummary, GeneratedScript, TaskStatus
+from db.models.subtitle import Video, Subtitle, SubtitleSource, Platform, SubtitleSummary, GeneratedScript, TaskStatus, \
+    TranscriptionCache, SearchCache
 from services.coze.coze import CozeClient
 from services.coze.config import CozeConfig, Config
 from db.models.subtitle import get_video_url
@@ -329,6 +330,165 @@ class SubtitleManager:
             print(f"保存字幕失败: {str(e)}")
             raise
 
+    @staticmethod
+    def _transcription_cache_key(
+        fingerprint: str,
+        model_name: str,
+        language: str,
+        prompt: Optional[str],
+        decode_profile: str
+    ) -> str:
+        """生成转录缓存键"""
+        raw = f"{fingerprint}|{model_name}|{language or ''}|{prompt or ''}|{decode_profile}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get_cached_transcription(
+        self,
+        fingerprint: str,
+        model_name: str,
+        language: str,
+        prompt: Optional[str],
+        decode_profile: str
+    ) -> Optional[Dict]:
+        """按音频指纹获取已缓存的转录结果
+        
+        Args:
+            fingerprint: 解码后音频的指纹
+            model_name: 配置的Whisper模型名称
+            language: 配置的识别语言
+            prompt: 配置的识别提示词
+            decode_profile: 影响转录结果的其他解码设置(引擎、语言识别、人声检测、质量模式、解码路径)
+            
+        Returns:
+            Dict: 包含content、timed_content以及实际使用的model_name、language的字典，未命中返回None
+        """
+        try:
+            cache_key = self._transcription_cache_key(fingerprint, model_name, language, prompt, decode_profile)
+            with self._db_transaction() as db:
+                cached = db.query(TranscriptionCache).filter(
+                    TranscriptionCache.cache_key == cache_key
+                ).first()
+                if not cached:
+                    return None
+
+                cached.hit_count = (cached.hit_count or 0) + 1
+                cached.last_hit_time = datetime.utcnow()
+                return {
+                    'content': cached.content,
+                    'timed_content': cached.timed_content,
+                    'model_name': cached.model_name,
+                    'language': cached.language
+                }
+        except Exception as e:
+            print(f"获取转录缓存失败: {str(e)}")
+            return None
+
+    def save_cached_transcription(
+        self,
+        fingerprint: str,
+        model_name: str,
+        language: str,
+        prompt: Optional[str],
+        decode_profile: str,
+        content: str,
+        timed_content: Optional[Dict],
+        result_model: Optional[str] = None,
+        result_language: Optional[str] = None
+    ) -> None:
+        """保存转录结果到缓存
+        
+        缓存键由配置的模型、语言和提示词生成,转录前无需先识别语言即可查找;
+        语言识别改变了实际使用的模型或语言时,通过 result_model、result_language 记录实际值
+        """
+        try:
+            cache_key = self._transcription_cache_key(fingerprint, model_name, language, prompt, decode_profile)
+            with self._db_transaction() as db:
+                exists = db.query(TranscriptionCache.id).filter(
+                    TranscriptionCache.cache_key == cache_key
+                ).first()
+                if exists:
+                    return
+                db.add(TranscriptionCache(
+                    cache_key=cache_key,
+                    fingerprint=fingerprint,
+                    model_name=result_model or model_name,
+                    language=result_language or language,
+                    content=content,
+                    timed_content=timed_content
+                ))
+        except Exception as e:
+            # 缓存写入失败不影响转录结果
+            print(f"保存转录缓存失败: {str(e)}")
+
+    @staticmethod
+    def _search_cache_key(platform: Platform, keyword: str, order: str) -> str:
+        """生成搜索缓存键"""
+        raw = f"{platform.value}|{keyword.strip().lower()}|{order}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get_cached_search(self, platform: Platform, keyword: str, order: str) -> Optional[Dict]:
+        """获取缓存的搜索结果
+        
+        Args:
+            platform: 平台
+            keyword: 搜索关键词
+            order: 排序方式
+            
+        Returns:
+            Dict: 包含results、next_page、exhausted、fetch_time的字典，未命中返回None
+        """
+        try:
+            cache_key = self._search_cache_key(platform, keyword, order)
+            with get_db() as db:
+                cached = db.query(SearchCache).filter(SearchCache.cache_key == cache_key).first()
+                if not cached:
+                    return None
+                return {
+                    'results': cached.results or [],
+                    'next_page': cached.next_page,
+                    'exhausted': bool(cached.exhausted),
+                    'fetch_time': cached.fetch_time
+                }
+        except Exception as e:
+            print(f"获取搜索缓存失败: {str(e)}")
+            return None
+
+    def save_cached_search(
+        self,
+        platform: Platform,
+        keyword: str,
+        order: str,
+        results: List[Dict],
+        next_page: Optional[int],
+        exhausted: bool,
+        fetch_time: Optional[datetime] = None
+    ) -> None:
+        """保存搜索结果到缓存,已存在时覆盖
+        
+        Args:
+            platform: 平台
+            keyword: 搜索关键词
+            order: 排序方式
+            results: 按排名排列的搜索结果
+            next_page: 追加结果时请求的下一页
+            exhausted: 平台是否已没有更多结果
+            fetch_time: 结果第一页的获取时间,默认为当前时间
+        """
+        try:
+            cache_key = self._search_cache_key(platform, keyword, order)
+            with self._db_transaction() as db:
+                cached = db.query(SearchCache).filter(SearchCache.cache_key == cache_key).first()
+                if not cached:
+                    cached = SearchCache(cache_key=cache_key, platform=platform.value, keyword=keyword, order_by=order)
+                    db.add(cached)
+                cached.results = results
+                cached.next_page = next_page
+                cached.exhausted = exhausted
+                cached.fetch_time = fetch_time or datetime.utcnow()
+        except Exception as e:
+            # 缓存写入失败不影响搜索结果
+            print(f"保存搜索缓存失败: {str(e)}")
+
     def _parse_timestamp(self, timestamp: str) -> float:
         """解析时间戳字符串为秒数
         
@@ -408,23 +568,19 @@ class SubtitleManager:
                 for v in videos
             ] 
 
-    def clean_old_audio_files(self, max_age_days: int = 7):
-        """清理过期的音频文件"""
-        with get_db() as db:
-            cutoff_date = datetime.utcnow() - timedelta(days=max_age_days)
-            old_videos = db.query(Video).filter(
-                Video.update_time < cutoff_date,
-                Video.audio_path.isnot(None)
-            ).all()
-            
-            for video in old_videos:
-                if video.audio_path and os.path.exists(video.audio_path):
-                    try:
-                        os.remove(video.audio_path)
-                        video.audio_path = None
-                        db.commit()
-                    except Exception as e:
-                        print(f"清理音频文件失败 {video.audio_path}: {str(e)}")
+    def clear_audio_paths(self, evicted: List[tuple]) -> None:
+        """音频被音频存储淘汰后,清空对应视频记录中的音频路径
+        
+        Args:
+            evicted: (平台, 视频ID, 文件路径) 列表
+        """
+        with self._db_transaction() as db:
+            for platform, platform_vid, audio_path in evicted:
+                db.query(Video).filter(
+                    Video.platform == platform,
+                    Video.platform_vid == platform_vid,
+                    Video.audio_path == audio_path
+                ).update({Video.audio_path: None}, synchronize_session=False)
 
     def get_video_by_platform_id(self, platform: Platform, platform_vid: str) -> Optional[Dict]:
         """通过平台视频ID获取视频信息
@@ -771,6 +927,89 @@ class SubtitleManager:
             print(f"获取脚本列表失败: {str(e)}")
             raise 
 
+    def get_preview_relevance(self, platform: Platform, platform_vid: str, topic: str) -> Optional[Dict]:
+        """获取级联模式预览阶段记录的相关性判断
+        
+        Returns:
+            Dict: 包含association、keypoints的字典，未判断过返回None
+        """
+        try:
+            with get_db() as db:
+                video = db.query(Video).filter(
+                    Video.platform == platform.value,
+                    Video.platform_vid == platform_vid
+                ).first()
+                if not video or not video.extra_info:
+                    return None
+                return (video.extra_info.get('preview_relevance') or {}).get(topic)
+        except Exception as e:
+            print(f"获取预览相关性记录失败: {str(e)}")
+            return None
+
+    def _save_preview_relevance(self, platform: Platform, platform_vid: str, topic: str, keypoints_result: Dict):
+        """把预览阶段的关键点结果按主题记录到视频的extra_info中"""
+        try:
+            with self._db_transaction() as db:
+                video = db.query(Video).filter(
+                    Video.platform == platform.value,
+                    Video.platform_vid == platform_vid
+                ).first()
+                if not video:
+                    return
+                extra_info = dict(video.extra_info or {})
+                relevance = dict(extra_info.get('preview_relevance') or {})
+                relevance[topic] = {
+                    'association': bool(keypoints_result.get('association')),
+                    'keypoints': keypoints_result,
+                    'time': datetime.utcnow().isoformat()
+                }
+                extra_info['preview_relevance'] = relevance
+                # JSON列需要整体赋值才会被识别为修改
+                video.extra_info = extra_info
+        except Exception as e:
+            print(f"保存预览相关性记录失败: {str(e)}")
+
+    async def check_relevance(
+        self,
+        topic: str,
+        content: str,
+        platform: Platform,
+        platform_vid: str,
+        title: str = '',
+        language: str = 'zh'
+    ) -> bool:
+        """判断一段文本(如预览转录)是否与主题相关
+        
+        判断结果连同关键点记录到视频上:无关的视频重新运行批量任务时直接跳过,
+        相关的视频在总结阶段复用这次的关键点,不再重复调用关键点工作流
+        
+        Args:
+            topic: 主题
+            content: 待判断的文本
+            platform: 平台
+            platform_vid: 平台视频ID
+            title: 视频标题
+            language: 文本语言
+            
+        Returns:
+            bool: 是否相关，判断失败时返回True以免漏掉相关视频
+        """
+        try:
+            keypoints_result = await self.coze_client.run_keypoints_workflow(
+                topic=topic,
+                subtitle=content,
+                language=language,
+                title=title,
+                source='search'
+            )
+            if not keypoints_result:
+                return True
+            self._save_preview_relevance(platform, platform_vid, topic, keypoints_result)
+            return bool(keypoints_result.get('association'))
+        except Exception as e:
+            print(f"相关性判断失败: {str(e)}")
+            return True
+
     async def process_subtitle_summary(self, topic: str, subtitle_id: int, content: str) -> None:
         """异步处理字幕总结（新流程）"""
         try:
@@ -807,15 +1046,21 @@ class SubtitleManager:
                 video_title = video.title
                 video_source_type = video.source_type
                 platform_vid = video.platform_vid
+                preview = ((video.extra_info or {}).get('preview_relevance') or {}).get(topic)
 
-            # 在数据库会话外调用外部API
-            keypoints_result = await self.coze_client.run_keypoints_workflow(
-                topic=topic,
-                subtitle=content,
-                language=subtitle_language,
-                title=video_title,
-                source=video_source_type
-            )
+            if preview and preview.get('association') and preview.get('keypoints'):
+                # 级联模式的预览阶段已对该主题提取过关键点,直接复用
+                print(f"视频 {platform_vid} 复用预览阶段的关键点")
+                keypoints_result = preview['keypoints']
+            else:
+                # 在数据库会话外调用外部API
+                keypoints_result = await self.coze_client.run_keypoints_workflow(
+                    topic=topic,
+                    subtitle=content,
+                    language=subtitle_language,
+                    title=video_title,
+                    source=video_source_type
+                )
             
             if not keypoints_result:
                 print("关键点提取失败")
@@ -1,25 +1,62 @@
+import math
+import os
 import time
 import sys
 import asyncio
-from typing import List, Optional
+import hashlib
+import json
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 from db.models.subtitle import SubtitleSource, Platform
+from services.bili2text.core.audio_utils import SAMPLE_RATE, fingerprint_audio, load_audio, split_on_silence, \
+    detect_speech_regions, concat_regions, remap_timestamp
+from services.bili2text.core.checkpoint import TranscriptionCheckpoint
+from services.bili2text.core.engines import ENGINE_FASTER_WHISPER, detect_language, load_engine_model, resolve_model_key
+from services.bili2text.core.model_cache import ModelCache, ModelKey
 from services.bili2text.core.subtitle_manager import SubtitleManager
-from services.bili2text.core.utils import retry_on_failure
+from services.bili2text.core.utils import convert_to_webvtt, retry_on_failure
 from services.config_service import ConfigurationService
 
 
+def segment_collector(segments: List[dict], label: str) -> Callable[[List[dict]], Awaitable[None]]:
+    """生成流式转录的片段回调:把每个窗口提交的片段追加到 segments,并输出转录进度
+
+    Args:
+        segments: 接收片段的列表,调用方持有它即可在转录完成前读取已提交的片段
+        label: 进度日志中的视频标识
+    """
+    async def collect_segments(window_segments: List[dict]):
+        segments.extend(
+            {"start": round(segment["start"], 2), "end": round(segment["end"], 2), "text": segment["text"]}
+            for segment in window_segments
+        )
+        if segments:
+            print(f"{label} 已转录到 {segments[-1]['end']:.0f} 秒, 共 {len(segments)} 个片段")
+    return collect_segments
+
+
 class AudioTranscriber:
     """音频转写器,负责将音频转写为文本"""
 
+    # 所有转写器实例共享同一个转写线程池，避免阻塞事件循环
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    # 所有转写器实例共享同一个模型缓存
+    _model_cache: Optional[ModelCache] = None
+
     def __init__(self):
         """初始化转写器"""
         config_service = ConfigurationService()
         self.output_dir = Path(config_service.get_config("system", "output_dir"))
+        self.checkpoint_dir = Path(config_service.get_config("system", "temp_dir")) / "transcribe_checkpoints"
         self._whisper = None
-        self._model = None
-        self.current_model_name = None
         self.subtitle_manager = SubtitleManager()
+        # 预热状态: pending/warming/ready/failed
+        self.warmup_state = {"status": "pending", "model_name": None, "elapsed": None, "error": None}
 
         # 确保输出目录存在
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -34,32 +71,817 @@ class AudioTranscriber:
             print(f"[{time.time()}] whisper 模块导入完成，耗时: {time.time() - start_time:.2f}秒")
         return self._whisper
 
-    def load_model(self, model_name: str):
+    @staticmethod
+    def max_concurrent_transcriptions() -> int:
+        """转写线程池的工作线程数,即 system.max_concurrent_transcriptions"""
+        config_service = ConfigurationService()
+        return max(1, int(config_service.get_config("system", "max_concurrent_transcriptions") or 1))
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        """获取转写线程池,大小由 system.max_concurrent_transcriptions 决定"""
+        with cls._executor_lock:
+            if cls._executor is None:
+                max_workers = cls.max_concurrent_transcriptions()
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix="transcriber"
+                )
+                print(f"转写线程池已创建,最大并发转录数: {max_workers}")
+            return cls._executor
+
+    @classmethod
+    def shutdown_executor(cls, wait: bool = False):
+        """关闭转写线程池"""
+        with cls._executor_lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=wait, cancel_futures=True)
+                cls._executor = None
+
+    @property
+    def model_cache(self) -> ModelCache:
+        """获取模型缓存,内存预算由 whisper.model_cache_budget_mb 决定"""
+        config_service = ConfigurationService()
+        budget_mb = config_service.get_config("whisper", "model_cache_budget_mb") or 4096
+        with self._executor_lock:
+            if AudioTranscriber._model_cache is None:
+                AudioTranscriber._model_cache = ModelCache(self.load_model, int(budget_mb))
+            else:
+                # 预算可通过配置接口在运行时调整
+                AudioTranscriber._model_cache.memory_budget = int(budget_mb) * 1024 * 1024
+        return AudioTranscriber._model_cache
+
+    def get_model_key(self, model_name: str) -> ModelKey:
+        """根据模型名称、whisper.engine 配置和当前硬件确定模型缓存键"""
+        config_service = ConfigurationService()
+        engine = config_service.get_config("whisper", "engine") or "openai"
+        return resolve_model_key(model_name, engine, self.whisper.torch.cuda.is_available())
+
+    def load_model(self, key: ModelKey):
         """加载Whisper模型
         
         Args:
+            key: 模型缓存键
+            
+        Returns:
+            加载完成的模型
+        """
+        start_time = time.time()
+        print(f"[{time.time()}] 开始加载 whisper 模型：{key.model_name} (引擎: {key.engine}, 精度: {key.precision})")
+        print(f"[{time.time()}] 使用的设备: {key.device}")
+        if key.device == "cuda":
+            print(f"[{time.time()}] GPU信息: {self.whisper.torch.cuda.get_device_name(0)}")
+        else:
+            # 多个转写线程并行时平分CPU核心，避免线程过度争用
+            workers = self.max_concurrent_transcriptions()
+            self.whisper.torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+        model = load_engine_model(self.whisper, key)
+        print(f"[{time.time()}] whisper 模型加载完成，耗时: {time.time() - start_time:.2f}秒")
+        return model
+
+    def _warm_up_sync(self, model_name: str, language: str):
+        """在转写线程中导入whisper、加载模型并执行一次极短的解码"""
+        key = self.get_model_key(model_name)
+        with self.model_cache.acquire(key) as model:
+            model.transcribe(
+                np.zeros(SAMPLE_RATE, dtype=np.float32),
+                language=language,
+                fp16=key.precision == "fp16",
+                verbose=None
+            )
+
+    async def warm_up(self):
+        """后台预热转写器,使第一个转录请求直接使用已加载的模型"""
+        config_service = ConfigurationService()
+        model_name = config_service.get_config("whisper", "model_name")
+        language = config_service.get_config("whisper", "language")
+        self.warmup_state.update(status="warming", model_name=model_name)
+
+        start_time = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.get_executor(),
+                partial(self._warm_up_sync, model_name, language)
+            )
+            if config_service.get_config("whisper", "language_detection"):
+                # 语言识别模型同样常驻,首个转录无需等待加载
+                detect_model = config_service.get_config("whisper", "language_detect_model") or "tiny"
+                await loop.run_in_executor(
+                    self.get_executor(),
+                    partial(self._warm_up_sync, detect_model, language)
+                )
+            self.warmup_state.update(status="ready", elapsed=round(time.time() - start_time, 2))
+            print(f"转写器预热完成，耗时: {time.time() - start_time:.2f}秒")
+        except Exception as e:
+            self.warmup_state.update(status="failed", error=str(e))
+            print(f"转写器预热失败: {str(e)}", file=sys.stderr)
+
+    def _transcribe_sync(self, audio, model_name: str, language: str, prompt: str, verbose: bool = True) -> dict:
+        """在转写线程中加载模型并执行转录
+        
+        Args:
+            audio: 音频文件路径或16kHz的PCM数组
             model_name: 模型名称
+            language: 语言
+            prompt: 提示词
+            verbose: 是否逐段打印转录结果
         """
-        # 如果模型名称改变,重新加载模型
-        if self._model is None or self.current_model_name != model_name:
-            start_time = time.time()
-            print(f"[{time.time()}] 开始加载 whisper 模型：{model_name}")
-            device = "cuda" if self.whisper.torch.cuda.is_available() else "cpu"
-            print(f"[{time.time()}] 检测到的设备: {device}")
-            if device == "cuda":
-                print(f"[{time.time()}] GPU信息: {self.whisper.torch.cuda.get_device_name(0)}")
-
-            self._model = self.whisper.load_model(
-                model_name,
-                device=device
+        key = self.get_model_key(model_name)
+        with self.model_cache.acquire(key) as model:
+            print("正在使用Whisper模型进行转录...")
+            return model.transcribe(
+                audio,
+                initial_prompt=prompt,
+                language=language,
+                temperature=0.2,
+                beam_size=5,
+                fp16=key.precision == "fp16",
+                condition_on_previous_text=False,
+                verbose=True if verbose else None
+            )
+
+    async def _transcribe_streaming(
+        self,
+        audio,
+        checkpoint: TranscriptionCheckpoint,
+        model_name: str,
+        language: str,
+        prompt: str,
+        on_segments: Optional[Callable[[List[dict]], Awaitable[None]]] = None
+    ) -> dict:
+        """流式转录:按窗口解码,每完成一个窗口就写入断点并交给回调,中断后从最后提交的位置继续
+        
+        窗口在转写线程池中并行解码,但严格按时间顺序提交
+        
+        Args:
+            audio: 16kHz的PCM数组
+            checkpoint: 转录断点
+            model_name: 模型名称
+            language: 语言
+            prompt: 提示词
+            on_segments: 每提交一个窗口后在事件循环中调用,参数为该窗口的片段(时间戳为处理后音频上的时间)
+            
+        Returns:
+            dict: 与whisper转录结果结构一致的字典
+        """
+        config_service = ConfigurationService()
+        window_seconds = config_service.get_config("whisper", "stream_window") or 300
+
+        if checkpoint.load():
+            print(f"从断点继续转录: 已完成 {checkpoint.offset / SAMPLE_RATE:.0f} 秒, "
+                  f"{len(checkpoint.segments)} 个片段")
+
+        offset = checkpoint.offset
+        remaining = audio[offset:]
+        n_windows = max(1, math.ceil(len(remaining) / SAMPLE_RATE / window_seconds))
+        windows = [(offset + start, offset + end) for start, end in split_on_silence(remaining, n_windows)]
+
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                self.get_executor(),
+                partial(self._transcribe_sync, audio[start:end], model_name, language, prompt, False)
+            )
+            for start, end in windows
+        ] if len(remaining) else []
+
+        detected_language = language
+        try:
+            for (start, end), future in zip(windows, futures):
+                window_result = await future
+                detected_language = window_result.get("language") or detected_language
+                segments = [
+                    {
+                        **segment,
+                        "id": len(checkpoint.segments) + index,
+                        "start": segment["start"] + start / SAMPLE_RATE,
+                        "end": segment["end"] + start / SAMPLE_RATE
+                    }
+                    for index, segment in enumerate(window_result["segments"])
+                ]
+                checkpoint.commit(end, segments)
+                if on_segments:
+                    await on_segments(segments)
+                print(f"流式转录进度: {end / SAMPLE_RATE:.0f}/{len(audio) / SAMPLE_RATE:.0f} 秒")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        return {
+            "text": "".join(segment["text"] for segment in checkpoint.segments),
+            "segments": checkpoint.segments,
+            "language": detected_language
+        }
+
+    async def _transcribe_long_audio(self, audio, model_name: str, language: str, prompt: str) -> dict:
+        """长音频模式:在静音处切块,并行转录后按全局时间偏移拼接
+        
+        Args:
+            audio: 16kHz的PCM数组
+            model_name: 模型名称
+            language: 语言
+            prompt: 提示词
+            
+        Returns:
+            dict: 与whisper转录结果结构一致的字典
+        """
+        config_service = ConfigurationService()
+        chunk_duration = config_service.get_config("whisper", "chunk_duration") or 600
+        executor = self.get_executor()
+
+        # 块数至少等于工作线程数,使所有工作线程都能参与
+        duration = len(audio) / SAMPLE_RATE
+        n_chunks = max(math.ceil(duration / chunk_duration), self.max_concurrent_transcriptions())
+        chunks = split_on_silence(audio, n_chunks)
+        print(f"长音频模式: 时长 {duration:.0f} 秒, 切分为 {len(chunks)} 块并行转录")
+
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                executor,
+                partial(self._transcribe_sync, audio[start:end], model_name, language, prompt, False)
+            )
+            for start, end in chunks
+        ]
+        try:
+            chunk_results = await asyncio.gather(*futures)
+        except BaseException:
+            # 一块失败时取消还在排队的块,并等待正在执行的块结束,
+            # 避免重试整个文件时与遗留的块争用工作线程
+            for future in futures:
+                future.cancel()
+            await asyncio.gather(*futures, return_exceptions=True)
+            raise
+
+        return self._stitch_results(chunk_results, [start / SAMPLE_RATE for start, _ in chunks])
+
+    def _stitch_results(self, results: List[dict], offsets: List[float]) -> dict:
+        """将分块转录结果拼接为一个结果,并把片段时间戳平移到全局时间轴
+        
+        Args:
+            results: 各块的whisper转录结果
+            offsets: 各块在原音频中的起始时间(秒)
+            
+        Returns:
+            dict: 拼接后的转录结果
+        """
+        segments = []
+        for result, offset in zip(results, offsets):
+            for segment in result["segments"]:
+                segments.append({
+                    **segment,
+                    "id": len(segments),
+                    "start": segment["start"] + offset,
+                    "end": segment["end"] + offset
+                })
+
+        return {
+            "text": "".join(result["text"] for result in results),
+            "segments": segments,
+            "language": results[0]["language"] if results else None
+        }
+
+    def _detect_language_sync(self, audio, model_name: str) -> Tuple[str, float]:
+        """使用小模型识别音频前30秒的语言"""
+        key = self.get_model_key(model_name)
+        with self.model_cache.acquire(key) as model:
+            return detect_language(self.whisper, model, audio[:self.whisper.audio.N_SAMPLES])
+
+    @staticmethod
+    def configured_decoding_settings(config_service: ConfigurationService) -> Tuple[str, str, str]:
+        """配置的模型、语言和提示词,也用作转录缓存键,与语言识别结果无关"""
+        return (
+            config_service.get_config("whisper", "model_name"),
+            config_service.get_config("whisper", "language"),
+            config_service.get_config("whisper", "prompt")
+        )
+
+    async def resolve_decoding_settings(self, audio, config_service: ConfigurationService) -> Tuple[str, str, str]:
+        """根据语言识别结果确定转录使用的模型、语言和提示词
+        
+        Args:
+            audio: 16kHz的PCM数组
+            config_service: 配置服务
+            
+        Returns:
+            Tuple[str, str, str]: (模型名称, 语言, 提示词)
+        """
+        model_name, language, prompt = self.configured_decoding_settings(config_service)
+        if not config_service.get_config("whisper", "language_detection"):
+            return model_name, language, prompt
+
+        detect_model = config_service.get_config("whisper", "language_detect_model") or "tiny"
+        min_prob = config_service.get_config("whisper", "language_min_prob") or 0
+        try:
+            loop = asyncio.get_running_loop()
+            detected, probability = await loop.run_in_executor(
+                self.get_executor(),
+                partial(self._detect_language_sync, audio, detect_model)
+            )
+        except Exception as e:
+            print(f"语言识别失败,使用配置的语言 {language}: {str(e)}", file=sys.stderr)
+            return model_name, language, prompt
+
+        if probability < min_prob:
+            print(f"语言识别置信度过低 ({detected}: {probability:.2f}),使用配置的语言 {language}")
+            return model_name, language, prompt
+
+        profile = (config_service.get_config("whisper", "language_profiles") or {}).get(detected, {})
+        if "prompt" in profile:
+            prompt = profile["prompt"]
+        elif detected != language:
+            # 配置的提示词针对默认语言,用于其他语言会误导解码
+            prompt = ""
+        model_name = profile.get("model_name") or model_name
+        print(f"识别语言: {detected} (置信度 {probability:.2f}), 使用模型 {model_name}")
+        return model_name, detected, prompt
+
+    def _transcribe_preview_sync(self, audio, model_name: str, language: str) -> str:
+        """使用小模型和贪心解码快速转录一段音频"""
+        key = self.get_model_key(model_name)
+        with self.model_cache.acquire(key) as model:
+            result = model.transcribe(
+                audio,
+                language=language,
+                temperature=0,
+                beam_size=None,
+                fp16=key.precision == "fp16",
+                condition_on_previous_text=False,
+                verbose=None
             )
-            self.current_model_name = model_name
-            print(f"[{time.time()}] whisper 模型加载完成，耗时: {time.time() - start_time:.2f}秒")
+        return result["text"]
+
+    async def transcribe_preview(self, audio_path: str) -> str:
+        """级联模式的第一遍:只用小模型转录开头若干分钟,用于判断视频与主题的相关性
+        
+        Args:
+            audio_path: 音频文件路径
+            
+        Returns:
+            str: 开头部分的转录文本
+        """
+        config_service = ConfigurationService()
+        model_name = config_service.get_config("whisper", "cascade_model") or "tiny"
+        minutes = config_service.get_config("whisper", "cascade_minutes") or 3
+        language = config_service.get_config("whisper", "language")
+
+        print(f"级联模式: 使用 {model_name} 模型预览转录前 {minutes} 分钟...")
+        audio = await asyncio.to_thread(load_audio, audio_path, SAMPLE_RATE, minutes * 60)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.get_executor(),
+            partial(self._transcribe_preview_sync, audio, model_name, language)
+        )
+
+    def _low_confidence_windows(self, segments: List[dict], duration: float) -> List[tuple]:
+        """找出低置信度片段,合并为需要重新解码的时间窗口
+        
+        Args:
+            segments: whisper转录片段(含avg_logprob、no_speech_prob、compression_ratio)
+            duration: 音频总时长(秒)
+            
+        Returns:
+            List[tuple]: [(起始秒, 结束秒), ...]
+        """
+        config_service = ConfigurationService()
+        logprob_threshold = config_service.get_config("whisper", "refine_logprob_threshold")
+        compression_threshold = config_service.get_config("whisper", "refine_compression_threshold")
 
-            print(f"模型所在设备: {next(self._model.parameters()).device}")
+        windows = []
+        for segment in segments:
+            avg_logprob = segment.get("avg_logprob", 0.0)
+            # 与whisper自身的判断一致:低置信度且大概率无语音的片段视为静音,不重新解码
+            if segment.get("no_speech_prob", 0.0) > 0.6 and avg_logprob < -1.0:
+                continue
+            if avg_logprob >= logprob_threshold and segment.get("compression_ratio", 0.0) <= compression_threshold:
+                continue
 
-    @retry_on_failure()  # 使用默认的重试配置
-    async def transcribe_file(self, topic: str, audio_path: str, video_id: str, platform: Platform) -> Optional[str]:
+            start = max(0.0, segment["start"] - 0.5)
+            end = min(duration, segment["end"] + 0.5)
+            if windows and start - windows[-1][1] < 1.0:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            else:
+                windows.append((start, end))
+        return windows
+
+    async def _refine_low_confidence(self, audio, result: dict, language: str, prompt: str) -> dict:
+        """质量模式:用更大的模型重新解码低置信度窗口,并替换原有片段
+        
+        Args:
+            audio: 16kHz的PCM数组
+            result: 快速模型的转录结果
+            language: 语言
+            prompt: 提示词
+            
+        Returns:
+            dict: 替换后的转录结果
+        """
+        config_service = ConfigurationService()
+        refine_model = config_service.get_config("whisper", "refine_model")
+        windows = self._low_confidence_windows(result["segments"], len(audio) / SAMPLE_RATE)
+        if not windows:
+            print("质量模式: 未发现低置信度片段")
+            return result
+
+        print(f"质量模式: 使用 {refine_model} 模型重新解码 {len(windows)} 个低置信度窗口, "
+              f"共 {sum(end - start for start, end in windows):.0f} 秒")
+        loop = asyncio.get_running_loop()
+        refined = await asyncio.gather(*[
+            loop.run_in_executor(
+                self.get_executor(),
+                partial(
+                    self._transcribe_sync,
+                    audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)],
+                    refine_model, language, prompt, False
+                )
+            )
+            for start, end in windows
+        ])
+
+        # 窗口内(以片段中点判断)的原片段被大模型的结果替换
+        segments = [
+            segment for segment in result["segments"]
+            if not any(start <= (segment["start"] + segment["end"]) / 2 < end for start, end in windows)
+        ]
+        for (start, _), refined_result in zip(windows, refined):
+            segments.extend(
+                {**segment, "start": segment["start"] + start, "end": segment["end"] + start}
+                for segment in refined_result["segments"]
+            )
+        segments.sort(key=lambda segment: segment["start"])
+        for index, segment in enumerate(segments):
+            segment["id"] = index
+
+        return {
+            **result,
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments
+        }
+
+    def _apply_vad(self, audio):
+        """人声检测预处理,去掉静音和纯音乐片段
+        
+        Args:
+            audio: 16kHz的PCM数组
+            
+        Returns:
+            tuple: (只含人声的PCM数组, 时间映射);未检测到人声时返回原音频和None
+        """
+        regions = detect_speech_regions(audio)
+        speech_audio, speech_map = concat_regions(audio, regions)
+        if len(speech_audio) == 0:
+            print("人声检测未发现语音,使用完整音频转录")
+            return audio, None
+
+        print(f"人声检测: 保留 {len(speech_audio) / SAMPLE_RATE:.0f}/{len(audio) / SAMPLE_RATE:.0f} 秒, "
+              f"共 {len(regions)} 个语音区域")
+        return speech_audio, speech_map
+
+    def _remap_result(self, result: dict, speech_map) -> dict:
+        """将人声拼接音频上的片段时间戳映射回原始时间轴"""
+        return {
+            **result,
+            "segments": [
+                {
+                    **segment,
+                    "start": remap_timestamp(segment["start"], speech_map),
+                    "end": remap_timestamp(segment["end"], speech_map, is_end=True)
+                }
+                for segment in result["segments"]
+            ]
+        }
+
+    def _remapping_segment_callback(
+        self,
+        on_segments: Callable[[List[dict]], Awaitable[None]],
+        speech_map
+    ) -> Callable[[List[dict]], Awaitable[None]]:
+        """包装流式片段回调,人声拼接音频上的时间戳先映射回原始时间轴再交给回调"""
+        async def remapped_on_segments(segments: List[dict]):
+            await on_segments(self._remap_result({"segments": segments}, speech_map)["segments"])
+        return remapped_on_segments
+
+    def _segments_from_tokens(self, tokens: List[int], tokenizer, offset: float, window_duration: float) -> List[dict]:
+        """从带时间戳token的解码结果中解析出片段
+        
+        Args:
+            tokens: DecodingResult.tokens
+            tokenizer: whisper分词器
+            offset: 该窗口在音频中的起始时间(秒)
+            window_duration: 该窗口的有效时长(秒)
+        """
+        segments = []
+        start = None
+        text_tokens = []
+        for token in tokens:
+            if token >= tokenizer.timestamp_begin:
+                time_point = (token - tokenizer.timestamp_begin) * 0.02
+                if text_tokens:
+                    segments.append((start or 0.0, time_point, text_tokens))
+                    text_tokens = []
+                    start = None
+                else:
+                    start = time_point
+            elif token < tokenizer.eot:
+                text_tokens.append(token)
+        if text_tokens:
+            segments.append((start or 0.0, window_duration, text_tokens))
+
+        return [
+            {
+                "start": offset + seg_start,
+                "end": offset + min(seg_end, window_duration),
+                "text": tokenizer.decode(seg_tokens),
+                "tokens": seg_tokens
+            }
+            for seg_start, seg_end, seg_tokens in segments
+        ]
+
+    def _decode_batch_sync(self, audios: List, model_name: str, language: str, prompt: str) -> List[dict]:
+        """把多个短音频的30秒梅尔窗口拼成一个批次,一次前向完成解码
+        
+        Args:
+            audios: 16kHz的PCM数组列表
+            model_name: 模型名称
+            language: 语言
+            prompt: 提示词
+            
+        Returns:
+            List[dict]: 与whisper转录结果结构一致的字典列表,顺序与输入一致
+        """
+        whisper = self.whisper
+        key = self.get_model_key(model_name)
+        with self.model_cache.acquire(key) as model:
+            if key.engine == ENGINE_FASTER_WHISPER:
+                # CTranslate2后端不提供批量梅尔接口,逐个转录
+                return [
+                    model.transcribe(audio, initial_prompt=prompt, language=language,
+                                     beam_size=5, condition_on_previous_text=False)
+                    for audio in audios
+                ]
+
+            # 每个音频切为若干30秒窗口,记录窗口归属
+            windows = []
+            for clip_index, audio in enumerate(audios):
+                for start in range(0, max(len(audio), 1), whisper.audio.N_SAMPLES):
+                    piece = audio[start:start + whisper.audio.N_SAMPLES]
+                    windows.append((clip_index, start / SAMPLE_RATE, len(piece) / SAMPLE_RATE, piece))
+
+            mel = whisper.torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(piece), model.dims.n_mels)
+                for _, _, _, piece in windows
+            ]).to(model.device)
+
+            options = whisper.DecodingOptions(
+                language=language,
+                prompt=prompt or None,
+                temperature=0.0,
+                beam_size=5,
+                without_timestamps=False,
+                fp16=key.precision == "fp16"
+            )
+            decoded = whisper.decode(model, mel, options)
+            tokenizer = whisper.tokenizer.get_tokenizer(
+                model.is_multilingual, num_languages=model.num_languages, language=language, task="transcribe"
+            )
+
+            results = [{"text": "", "segments": [], "language": language} for _ in audios]
+            for (clip_index, offset, duration, _), window_result in zip(windows, decoded):
+                clip_result = results[clip_index]
+                if window_result.no_speech_prob > 0.6 and window_result.avg_logprob < -1.0:
+                    continue
+                for segment in self._segments_from_tokens(window_result.tokens, tokenizer, offset, duration):
+                    clip_result["segments"].append({
+                        **segment,
+                        "id": len(clip_result["segments"]),
+                        "seek": int(offset * SAMPLE_RATE / whisper.audio.HOP_LENGTH),
+                        "temperature": window_result.temperature,
+                        "avg_logprob": window_result.avg_logprob,
+                        "compression_ratio": window_result.compression_ratio,
+                        "no_speech_prob": window_result.no_speech_prob
+                    })
+            for clip_result in results:
+                clip_result["text"] = "".join(segment["text"] for segment in clip_result["segments"])
+            return results
+
+    async def transcribe_batch(self, topic: str, items: List[Dict]) -> List[Optional[str]]:
+        """批量转录多个短音频,短于 whisper.batch_max_duration 的音频合并为张量批次一起解码
+        
+        Args:
+            topic: 主题
+            items: 待转录音频列表,每项包含 audio_path、video_id、platform
+            
+        Returns:
+            List[Optional[str]]: 与输入顺序一致的转录文本,失败的项为None
+        """
+        config_service = ConfigurationService()
+        max_duration = config_service.get_config("whisper", "batch_max_duration") or 120
+        batch_windows = config_service.get_config("whisper", "batch_size") or 8
+        use_cache = config_service.get_config("whisper", "transcription_cache")
+        decode_profile = self._decode_profile(config_service, batched=True)
+        cache_settings = self.configured_decoding_settings(config_service)
+
+        texts: List[Optional[str]] = [None] * len(items)
+        short_clips = []
+        long_items = []
+        for index, item in enumerate(items):
+            try:
+                audio = await asyncio.to_thread(load_audio, item['audio_path'])
+            except Exception as e:
+                print(f"音频解码失败 {item['video_id']}: {str(e)}", file=sys.stderr)
+                continue
+
+            if len(audio) / SAMPLE_RATE > max_duration:
+                long_items.append(index)
+                continue
+
+            # 先按配置的设置查找缓存,未命中时才识别语言
+            fingerprint = await asyncio.to_thread(fingerprint_audio, audio) if use_cache else None
+            if fingerprint:
+                cached = await self._save_from_cache(
+                    topic, item['video_id'], item['platform'], fingerprint, decode_profile, *cache_settings
+                )
+                if cached is not None:
+                    texts[index] = cached
+                    continue
+            settings = await self.resolve_decoding_settings(audio, config_service)
+            short_clips.append((index, audio, fingerprint, settings))
+
+        # 相同模型、语言和提示词的音频按窗口数分组,每组作为一个张量批次提交到转写线程池
+        groups = []
+        by_settings: Dict[tuple, list] = {}
+        for clip in short_clips:
+            by_settings.setdefault(clip[3], []).append(clip)
+        for clips in by_settings.values():
+            group, group_windows = [], 0
+            for clip in clips:
+                clip_windows = max(1, math.ceil(len(clip[1]) / SAMPLE_RATE / 30))
+                if group and group_windows + clip_windows > batch_windows:
+                    groups.append(group)
+                    group, group_windows = [], 0
+                group.append(clip)
+                group_windows += clip_windows
+            if group:
+                groups.append(group)
+
+        print(f"批量转录: {len(short_clips)} 个短音频分为 {len(groups)} 个批次, {len(long_items)} 个长音频单独转录")
+        loop = asyncio.get_running_loop()
+        group_results = await asyncio.gather(*[
+            loop.run_in_executor(
+                self.get_executor(),
+                partial(self._decode_batch_sync, [clip[1] for clip in group], *group[0][3])
+            )
+            for group in groups
+        ], return_exceptions=True)
+
+        for group, results in zip(groups, group_results):
+            if isinstance(results, Exception):
+                print(f"批量解码失败: {str(results)}", file=sys.stderr)
+                continue
+            for (index, _, fingerprint, settings), result in zip(group, results):
+                item = items[index]
+                try:
+                    await self._save_result(
+                        topic, item['video_id'], item['platform'], result, *settings, fingerprint, decode_profile,
+                        cache_settings
+                    )
+                    texts[index] = result["text"]
+                except Exception as e:
+                    print(f"保存批量转录结果失败 {item['video_id']}: {str(e)}", file=sys.stderr)
+
+        for index in long_items:
+            item = items[index]
+            try:
+                texts[index] = await self.transcribe_file(topic, item['audio_path'], item['video_id'], item['platform'])
+            except Exception as e:
+                print(f"转录失败 {item['video_id']}: {str(e)}", file=sys.stderr)
+
+        return texts
+
+    def _decode_profile(self, config_service: ConfigurationService, batched: bool) -> str:
+        """汇总模型、语言、提示词之外会影响转录结果的设置,作为转录缓存键的一部分
+        
+        批量解码路径不做人声检测和质量模式精修,因此不计入这两项
+        
+        Args:
+            config_service: 配置服务
+            batched: 是否走批量解码路径
+        """
+        engine = config_service.get_config("whisper", "engine") or "openai"
+        detect = "off"
+        if config_service.get_config("whisper", "language_detection"):
+            # 缓存键使用配置的语言,语言识别的设置决定了实际使用的模型、语言和提示词
+            detect = ":".join(json.dumps(config_service.get_config("whisper", name), sort_keys=True) for name in (
+                "language_detect_model", "language_min_prob", "language_profiles"
+            ))
+        if batched:
+            return f"engine={engine}|detect={detect}|path=batch"
+
+        vad = bool(config_service.get_config("whisper", "vad_filter"))
+        refine = "off"
+        if config_service.get_config("whisper", "quality_mode"):
+            refine = ":".join(str(config_service.get_config("whisper", name)) for name in (
+                "refine_model", "refine_logprob_threshold", "refine_compression_threshold"
+            ))
+        return f"engine={engine}|detect={detect}|vad={vad}|refine={refine}|path=file"
+
+    async def _save_from_cache(
+        self,
+        topic: str,
+        video_id: str,
+        platform: Platform,
+        fingerprint: str,
+        decode_profile: str,
+        model_name: str,
+        language: str,
+        prompt: str
+    ) -> Optional[str]:
+        """命中转录缓存时直接保存字幕,model_name、language、prompt为配置的解码设置
+        
+        Returns:
+            Optional[str]: 命中时返回转录文本,未命中返回None
+        """
+        cached = self.subtitle_manager.get_cached_transcription(
+            fingerprint, model_name, language, prompt, decode_profile
+        )
+        if not cached:
+            return None
+
+        print(f"命中转录缓存 (指纹 {fingerprint[:12]}), 跳过转录")
+        await self.subtitle_manager.save_subtitle(
+            topic=topic,
+            video_id=video_id,
+            content=cached['content'],
+            timed_content=cached['timed_content'],
+            source=SubtitleSource.WHISPER,
+            platform=platform,
+            platform_vid=video_id,
+            language=cached['language'] or language,
+            model_name=cached['model_name'] or model_name,
+        )
+        return cached['content']
+
+    async def _save_result(
+        self,
+        topic: str,
+        video_id: str,
+        platform: Platform,
+        result: dict,
+        model_name: str,
+        language: str,
+        prompt: str,
+        fingerprint: Optional[str],
+        decode_profile: str,
+        cache_settings: Tuple[str, str, str]
+    ):
+        """保存转录结果到字幕表,并写入转录缓存
+        
+        Args:
+            model_name: 实际使用的模型
+            language: 实际使用的语言
+            prompt: 实际使用的提示词
+            cache_settings: 配置的(模型, 语言, 提示词),用作转录缓存键
+        """
+        # 调用函数转换
+        webvtt_result = self.convert_to_webvtt(result)
+
+        # 先写入转录缓存，即使字幕保存失败，重试时也无需重新转录
+        if fingerprint:
+            self.subtitle_manager.save_cached_transcription(
+                fingerprint, *cache_settings, decode_profile, result["text"], webvtt_result,
+                result_model=model_name, result_language=language
+            )
+
+        # 保存字幕
+        try:
+            await self.subtitle_manager.save_subtitle(
+                topic=topic,
+                video_id=video_id,
+                content=result["text"],
+                timed_content=webvtt_result,
+                source=SubtitleSource.WHISPER,
+                platform=platform,
+                platform_vid=video_id,
+                language=language,
+                model_name=model_name,
+            )
+        except Exception as e:
+            print(f"保存字幕失败: {str(e)}")
+            raise
+
+    # 长音频失败时整个文件重新转录,尝试次数单独由 whisper.max_retries 限制
+    @retry_on_failure(config_section="whisper")
+    async def transcribe_file(
+        self,
+        topic: str,
+        audio_path: str,
+        video_id: str,
+        platform: Platform,
+        on_segments: Optional[Callable[[List[dict]], Awaitable[None]]] = None
+    ) -> Optional[str]:
         """转录单个音频文件
         
         Args:
@@ -67,6 +889,7 @@ class AudioTranscriber:
             audio_path: 音频文件路径
             video_id: 视频ID
             platform: 平台
+            on_segments: 流式模式下每完成一个窗口调用一次,参数为该窗口的片段(质量模式精修前的结果)
             
         Returns:
             Optional[str]: 转录文本,失败返回None
@@ -76,53 +899,79 @@ class AudioTranscriber:
         """
         try:
             config_service = ConfigurationService()
-            model_name = config_service.get_config("whisper", "model_name")
-            language = config_service.get_config("whisper", "language")
-            prompt = config_service.get_config("whisper", "prompt")
             
             # 获取视频信息以显示标题
             video_info = self.subtitle_manager.get_video_info(platform, video_id)
             video_title = f"「{video_info['title']}」" if video_info and video_info.get('title') else ''
             print(f"开始转录音频文件 [{platform.value}] {video_id} {video_title}")
 
-            # 加载模型
-            self.load_model(model_name)
-            print("正在使用Whisper模型进行转录...")
+            # 音频只解码一次,后续直接使用PCM数组
+            audio = await asyncio.to_thread(load_audio, audio_path)
+            duration = len(audio) / SAMPLE_RATE
 
-            # 使用whisper进行转录
-            result = self._model.transcribe(
-                str(audio_path),
-                initial_prompt=prompt,
-                language=language,
-                temperature=0.2,
-                beam_size=5,
-                fp16=True,
-                condition_on_previous_text=False,
-                verbose=True
-            )
+            # 相同音频(重复上传、跨平台搬运)直接复用已有的转录结果
+            # 缓存键使用配置的模型、语言和提示词,并包含引擎、语言识别、人声检测和质量模式等设置,
+            # 设置变化后不会复用旧结果;命中时无需识别语言
+            use_cache = config_service.get_config("whisper", "transcription_cache")
+            decode_profile = self._decode_profile(config_service, batched=False)
+            cache_settings = self.configured_decoding_settings(config_service)
+            fingerprint = None
+            if use_cache:
+                fingerprint = await asyncio.to_thread(fingerprint_audio, audio)
+                cached = await self._save_from_cache(
+                    topic, video_id, platform, fingerprint, decode_profile, *cache_settings
+                )
+                if cached is not None:
+                    return cached
 
-            print("转录完成,正在保存结果...")
-            # 调用函数转换
-            webvtt_result = self.convert_to_webvtt(result)
+            # 按开头30秒的语言选择模型、语言和提示词
+            model_name, language, prompt = await self.resolve_decoding_settings(audio, config_service)
 
-            # 保存字幕
-            try:
-                await self.subtitle_manager.save_subtitle(
-                    topic=topic,
-                    video_id=video_id,
-                    content=result["text"],
-                    timed_content=webvtt_result,
-                    source=SubtitleSource.WHISPER,
-                    platform=platform.value,
-                    platform_vid=video_id,
-                    language=language,
-                    model_name=model_name,
+            # 只把人声区域送入模型,转录完成后再映射回原始时间轴
+            speech_map = None
+            if config_service.get_config("whisper", "vad_filter"):
+                audio, speech_map = await asyncio.to_thread(self._apply_vad, audio)
+                duration = len(audio) / SAMPLE_RATE
+
+            checkpoint = None
+            long_audio_threshold = config_service.get_config("whisper", "long_audio_threshold")
+            if config_service.get_config("whisper", "streaming"):
+                # 音频、模型、引擎或预处理参数变化时旧断点失效
+                audio_fingerprint = fingerprint or await asyncio.to_thread(fingerprint_audio, audio)
+                job_key = hashlib.sha256(
+                    f"{audio_fingerprint}|{model_name}|{language}|{prompt}|{decode_profile}".encode('utf-8')
+                ).hexdigest()
+                checkpoint = TranscriptionCheckpoint(self.checkpoint_dir, platform.value, video_id, job_key)
+                if on_segments and speech_map:
+                    on_segments = self._remapping_segment_callback(on_segments, speech_map)
+                result = await self._transcribe_streaming(
+                    audio, checkpoint, model_name, language, prompt, on_segments
                 )
-            except Exception as e:
-                print(f"保存字幕失败: {str(e)}")
-                raise
+            elif long_audio_threshold and duration >= long_audio_threshold:
+                result = await self._transcribe_long_audio(audio, model_name, language, prompt)
+            else:
+                # 在转写线程池中加载模型并转录，不阻塞事件循环
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self.get_executor(),
+                    partial(self._transcribe_sync, audio, model_name, language, prompt)
+                )
+
+            if config_service.get_config("whisper", "quality_mode"):
+                result = await self._refine_low_confidence(audio, result, language, prompt)
+
+            if speech_map:
+                result = self._remap_result(result, speech_map)
+
+            print("转录完成,正在保存结果...")
+            await self._save_result(
+                topic, video_id, platform, result, model_name, language, prompt, fingerprint, decode_profile,
+                cache_settings
+            )
 
             print("转录结果已保存")
+            if checkpoint:
+                checkpoint.clear()
             return result["text"]
 
         except Exception as e:
@@ -140,22 +989,4 @@ class AudioTranscriber:
         Returns:
             dict: WebVTT格式的字幕字典
         """
-        webvtt = {
-            "type": "webvtt",
-            "metadata": {
-                "kind": "captions",
-                "language": "en-US" if result["language"] == "en" else result["language"] + "-" + result[
-                    "language"].upper()
-            },
-            "segments": []
-        }
-
-        # 转换每个片段
-        for segment in result["segments"]:
-            webvtt["segments"].append({
-                "start": round(segment["start"], 2),
-                "end": round(segment["end"], 2),
-                "text": segment["text"]
-            })
-
-        return webvtt
+        return convert_to_webvtt(result["segments"], result["language"])
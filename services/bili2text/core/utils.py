@@ -1,8 +1,9 @@
+import asyncio
 import logging
 import time
 from functools import wraps
 from pathlib import Path
-from typing import Callable, Any
+from typing import Callable, Any, Dict, List
 import sys
 import contextvars
 from services.config_service import ConfigurationService
@@ -14,33 +15,88 @@ original_stderr = sys.stderr
 # 定义一个ContextVar来存储当前的task_id
 current_task_id = contextvars.ContextVar('current_task_id', default=None)
 
-def retry_on_failure(max_retries: int = None, delay: int = None) -> Callable:
-    """重试装饰器"""
+def retry_on_failure(max_retries: int = None, delay: int = None, config_section: str = "system") -> Callable:
+    """重试装饰器,同时支持普通函数和协程函数(协程在重试间隔中不阻塞事件循环)
+
+    Args:
+        max_retries: 最大尝试次数,未指定时读取 {config_section}.max_retries,没有则使用 system.max_retries
+        delay: 重试间隔(秒),未指定时读取 system.retry_delay
+        config_section: 读取最大尝试次数的配置分组
+    """
     def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
+        def retry_settings():
             # 从配置服务获取重试参数
             config_service = ConfigurationService()
-            max_retries_value = max_retries or config_service.get_config("system", "max_retries")
+            max_retries_value = (max_retries or config_service.get_config(config_section, "max_retries")
+                                 or config_service.get_config("system", "max_retries"))
             delay_value = delay or config_service.get_config("system", "retry_delay")
-            
-            last_exception = None
+            return max_retries_value, delay_value
+
+        def report_failure(attempt: int, max_retries_value: int, e: Exception) -> bool:
+            """打印失败信息,返回是否已达到最大重试次数"""
+            print(f"第 {attempt + 1}/{max_retries_value} 次尝试失败: {str(e)}", 
+                  file=sys.stderr)
+            if attempt == max_retries_value - 1:
+                print(f"已达到最大重试次数 {max_retries_value}, 操作失败", 
+                      file=sys.stderr)
+                return True
+            return False
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                max_retries_value, delay_value = retry_settings()
+                for attempt in range(max_retries_value):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        if report_failure(attempt, max_retries_value, e):
+                            raise
+                        await asyncio.sleep(delay_value)
+                return None
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            max_retries_value, delay_value = retry_settings()
             for attempt in range(max_retries_value):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    print(f"第 {attempt + 1}/{max_retries_value} 次尝试失败: {str(e)}", 
-                          file=sys.stderr)
-                    if attempt == max_retries_value - 1:
-                        print(f"已达到最大重试次数 {max_retries_value}, 操作失败", 
-                              file=sys.stderr)
-                        raise last_exception
+                    if report_failure(attempt, max_retries_value, e):
+                        raise
                     time.sleep(delay_value)
             return None
         return wrapper
     return decorator 
 
+def convert_to_webvtt(segments: List[Dict], language: str) -> Dict:
+    """
+    将带时间戳的字幕片段转换为WebVTT格式字幕,字幕表中所有来源的 timed_content 都使用该格式
+    
+    Args:
+        segments: 字幕片段,每段包含 start、end(秒)和 text
+        language: 语言代码,如 zh、en
+        
+    Returns:
+        dict: WebVTT格式的字幕字典
+    """
+    return {
+        "type": "webvtt",
+        "metadata": {
+            "kind": "captions",
+            "language": "en-US" if language == "en" else language + "-" + language.upper()
+        },
+        "segments": [
+            {
+                "start": round(segment["start"], 2),
+                "end": round(segment["end"], 2),
+                "text": segment["text"]
+            }
+            for segment in segments
+        ]
+    }
+
 def setup_logging():
     """设置日志配置"""
     config_service = ConfigurationService()
@@ -1,13 +1,13 @@
 import asyncio
-import random
 import sys
-import time
 from typing import Dict, List, Optional
 
 from db.models.subtitle import Platform
 from services.bili2text.core.downloader import AudioDownloader
+from services.bili2text.core.pipeline import BatchPipeline
 from services.bili2text.core.subtitle_manager import SubtitleManager
-from services.bili2text.core.transcriber import AudioTranscriber
+from services.bili2text.core.transcriber import AudioTranscriber, segment_collector
+from services.config_service import ConfigurationService
 
 
 class VideoProcessor:
@@ -17,7 +17,6 @@ class VideoProcessor:
         self.downloader = downloader
         self.transcriber = transcriber
         self.subtitle_manager = SubtitleManager()
-        self.last_api_request_time = 0  # 记录上次请求API的时间
 
     async def process_single_video(self, topic: str, video_id: str, platform: Platform) -> Dict:
         """处理单个视频
@@ -26,7 +25,6 @@ class VideoProcessor:
             topic: 主题
             video_id: 视频ID
             platform: 平台(YOUTUBE/BILIBILI)
-            task_id: 任务ID(可选)
 
         """
         try:
@@ -80,102 +78,13 @@ class VideoProcessor:
         try:
             print(f"开始批量处理关键词: {keyword}, 平台: {platform.value}, 最大结果数: {max_results}")
             
-            # 1. 搜索视频
-            videos = await self.downloader.search_videos(keyword, platform, max_results)
-            results = []
-            total = len(videos)
-            
-            # 创建一个任务列表来跟踪所有的总结任务
-            summary_tasks = []
+            # 1. 搜索视频,YouTube边翻页边交给流水线
+            videos = self.downloader.stream_search_videos(keyword, platform, max_results)
+            cascade = bool(ConfigurationService().get_config("whisper", "cascade_enabled"))
             
-            # 2. 逐个处理视频
-            for i, video in enumerate(videos, 1):
-                video_id = video['id']
-                video_title = f"「{video['title']}」" if 'title' in video else ''
-                try:
-                    print(f"处理第 {i}/{total} 个视频 [{platform.value}] {video_id} {video_title}")
-                    
-                    # 检查数据库中是否存在
-                    existing_video = self.subtitle_manager.get_video_info(platform, video_id)
-                    if existing_video:
-                        print(f"数据库中已存在视频信息 [{platform.value}] {video_id} {video_title}")
-                        
-                    # 检查是否需要等待
-                    current_time = time.time()
-                    if platform in [Platform.BILIBILI, Platform.XIAOYUZHOU]:  # 添加小宇宙平台的延迟控制
-                        time_since_last_request = current_time - self.last_api_request_time
-                        delay = random.uniform(10, 20)  # 10-20秒随机延迟
-                        if not existing_video and time_since_last_request < delay:
-                            delay = delay - time_since_last_request
-                            print(f"等待 {delay:.1f} 秒以控制请求频率...")
-                            await asyncio.sleep(delay)
-                    
-                    # 处理视频并获取结果
-                    result = await self.process_single_video(topic, video_id, platform)
-
-                    # 如果有转写任务，等待其完成
-                    if result.get('transcribe_task'):
-                        try:
-                            print(f"等待视频 {video_id} 的转写任务完成...")
-                            content = await asyncio.wait_for(result['transcribe_task'], timeout=600)  # 10分钟超时
-                            result['content'] = content
-                            result['transcribe_task'] = None
-                        except asyncio.TimeoutError:
-                            print(f"视频 {video_id} 的转写任务超时")
-                            continue
-                        except Exception as e:
-                            print(f"视频 {video_id} 的转写任务失败: {str(e)}")
-                            continue
-
-                    # 如果有字幕内容，立即创建并执行总结任务
-                    if result.get('type') in ['subtitle', 'audio'] and result.get('content'):
-                        subtitle = self.subtitle_manager.get_subtitle(video_id)
-                        if subtitle and subtitle.get('id'):
-                            summary_task = asyncio.create_task(
-                                self.subtitle_manager.process_subtitle_summary(
-                                    topic=topic,
-                                    subtitle_id=subtitle['id'],
-                                    content=subtitle['content']
-                                )
-                            )
-                            summary_tasks.append(summary_task)
-                            print(f"已开始处理视频 {video_id} 的字幕总结任务")
-                            
-                            # 添加一个小的让步，让事件循环有机会调度任务
-                            await asyncio.sleep(1)
-
-                    # 如果实际发生了API请求，更新时间戳
-                    if not existing_video:
-                        self.last_api_request_time = time.time()
-                    
-                    # 更新搜索相关信息
-                    self.subtitle_manager.update_video_search_info(
-                        video_id,
-                        keyword,
-                        i,
-                        'search'
-                    )
-                    
-                    results.append(result)
-                    print(f"进度: {i}/{total}")
-                    
-                except Exception as e:
-                    print(f"处理视频失败 [{platform.value}] {video_id} {video_title}: {str(e)}")
-                    continue
-            
-            # 等待所有总结任务完成时增加超时处理
-            if summary_tasks:
-                print(f"等待 {len(summary_tasks)} 个字幕总结任务完成...")
-                try:
-                    await asyncio.wait_for(
-                        asyncio.gather(*summary_tasks, return_exceptions=True),
-                        timeout=1000  # 超时时间调整为10分钟
-                    )
-                    print("所有字幕总结任务已完成")
-                except asyncio.TimeoutError:
-                    print("部分字幕总结任务超时，继续处理")
-                except Exception as e:
-                    print(f"等待总结任务时发生错误: {str(e)}")
+            # 2. 按阶段流水线处理:元数据 → 官方字幕 → 下载 → 转写 → 总结
+            pipeline = BatchPipeline(self, topic, keyword, platform, cascade)
+            results = await pipeline.run(videos)
             
             # 3. 生成最终脚本
             try:
@@ -211,7 +120,6 @@ class VideoProcessor:
         Args:
             url: 视频URL
             platform: 平台
-            task_id: 任务ID
             
         Returns:
             Dict: 处理结果
@@ -219,8 +127,8 @@ class VideoProcessor:
         try:
             print(f"开始下载处理: {url}")
             
-            # 1. 下载媒体
-            result = await self.downloader.download_media(topic, url)
+            # 1. 下载媒体,音频在转写完成前固定在音频存储中,不会被淘汰
+            result = await self.downloader.download_media(topic, url, pin=True)
             
             # 2. 如果是字幕,直接返回
             if result['type'] == 'subtitle':
@@ -233,18 +141,24 @@ class VideoProcessor:
             # 3. 如果是音频,创建转写任务但不等待完成
             elif result['type'] == 'audio':
                 print("创建音频转写任务...")
+                # 流式转录时每提交一个窗口,片段就追加到 segments 中
+                segments = []
                 transcribe_task = asyncio.create_task(
                     self.transcriber.transcribe_file(
                         topic,
                         result['content'],
                         result['video_id'],
-                        platform
+                        platform,
+                        on_segments=segment_collector(segments, f"[{platform.value}] {result['video_id']}")
                     )
                 )
+                audio_path = result['content']
+                transcribe_task.add_done_callback(lambda _: self.downloader.audio_store.release(audio_path))
                 
                 return {
                     'type': 'audio',
                     'content': None,  # 转写尚未完成，content为None
+                    'segments': segments,  # 已转录的片段,转写完成前逐步增加
                     'video_id': result['video_id'],
                     'transcribe_task': transcribe_task  # 返回转写任务
                 }
@@ -254,6 +168,40 @@ class VideoProcessor:
             print(error_msg, file=sys.stderr)
             raise
 
+    async def _is_relevant_preview(self, topic: str, result: Dict, platform: Platform) -> bool:
+        """级联模式的相关性筛选:预览转录开头部分并判断是否与主题相关
+        
+        Args:
+            topic: 主题
+            result: download_media 返回的音频结果
+            platform: 平台
+            
+        Returns:
+            bool: 是否需要完整转录
+        """
+        try:
+            recorded = self.subtitle_manager.get_preview_relevance(platform, result['video_id'], topic)
+            if recorded is not None:
+                print(f"视频 {result['video_id']} 已有预览相关性记录: {'相关' if recorded['association'] else '无关'}")
+                return recorded['association']
+
+            preview = await self.transcriber.transcribe_preview(result['content'])
+            if not preview.strip():
+                print("预览部分未识别到语音,继续完整转录")
+                return True
+
+            video_info = self.subtitle_manager.get_video_info(platform, result['video_id'])
+            title = video_info.get('title', '') if video_info else ''
+            relevant = await self.subtitle_manager.check_relevance(topic, preview, platform, result['video_id'], title)
+            if relevant:
+                print(f"视频 {result['video_id']} 预览与主题相关,开始完整转录")
+            else:
+                print(f"视频 {result['video_id']} 预览与主题 '{topic}' 无关,跳过完整转录")
+            return relevant
+        except Exception as e:
+            print(f"预览转录失败,继续完整转录: {str(e)}")
+            return True
+
     def _get_video_url(self, video_id: str, platform: Platform) -> str:
         """根据平台生成视频URL"""
         if platform == Platform.YOUTUBE:
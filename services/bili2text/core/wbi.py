@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Tuple
+
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35,
+    27, 43, 5, 49, 33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13,
+    37, 48, 7, 16, 24, 55, 40, 61, 26, 17, 0, 1, 60, 51, 30, 4,
+    22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11, 36, 20, 34, 44, 52
+]
+
+# 签名校验失败时B站返回的错误码
+WBI_SIGN_ERROR_CODES = (-352, -403)
+
+
+def get_mixin_key(orig_key: str) -> str:
+    """由 img_key + sub_key 生成混合密钥"""
+    return ''.join(orig_key[i] for i in MIXIN_KEY_ENC_TAB)[:32]
+
+
+class WbiKeyManager:
+    """WBI签名密钥管理
+
+    密钥连同获取时间保存在磁盘上,重启后直接复用;密钥用到 ttl 的 refresh_ratio 时在后台刷新,
+    请求不等待刷新完成。keep_fresh 在服务运行期间按时刷新,签名请求访问到快过期的密钥时也会触发刷新。
+    只有从未获取过密钥时,首个签名请求才需要等待nav接口。
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[], Awaitable[Tuple[str, str]]],
+        cache_path: Path,
+        ttl: float = 6 * 3600,
+        refresh_ratio: float = 0.8
+    ):
+        """初始化密钥管理器
+
+        Args:
+            fetcher: 从nav接口获取 (img_key, sub_key) 的协程函数
+            cache_path: 密钥缓存文件
+            ttl: 密钥有效期(秒)
+            refresh_ratio: 密钥年龄达到 ttl 的该比例时后台刷新
+        """
+        self._fetcher = fetcher
+        self.cache_path = Path(cache_path)
+        self.ttl = ttl
+        self.refresh_ratio = refresh_ratio
+        self.img_key: Optional[str] = None
+        self.sub_key: Optional[str] = None
+        self.fetch_time = 0.0
+        self._mixin_key: Optional[str] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._load()
+
+    def _load(self):
+        """从磁盘加载上次获取的密钥"""
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._set_keys(data['img_key'], data['sub_key'], data['fetch_time'])
+            print(f"已加载WBI密钥缓存, 获取于 {(time.time() - self.fetch_time) / 3600:.1f} 小时前")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"读取WBI密钥缓存失败: {str(e)}")
+
+    def _save(self):
+        """原子地写入密钥缓存"""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'img_key': self.img_key, 'sub_key': self.sub_key, 'fetch_time': self.fetch_time}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _set_keys(self, img_key: str, sub_key: str, fetch_time: float):
+        self.img_key, self.sub_key, self.fetch_time = img_key, sub_key, fetch_time
+        self._mixin_key = get_mixin_key(img_key + sub_key)
+
+    @property
+    def age(self) -> float:
+        """密钥已使用的时间(秒)"""
+        return time.time() - self.fetch_time
+
+    async def refresh(self):
+        """重新获取密钥,并发调用时只请求一次nav接口"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        fetch_started = time.time()
+        async with self._refresh_lock:
+            if self.fetch_time >= fetch_started:
+                # 等锁期间其他调用已完成刷新
+                return
+            img_key, sub_key = await self._fetcher()
+            self._set_keys(img_key, sub_key, time.time())
+            self._save()
+            print("WBI密钥已刷新")
+
+    def _refresh_in_background(self):
+        """启动后台刷新,已有刷新在进行时不重复启动"""
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"后台刷新WBI密钥失败,继续使用旧密钥: {str(e)}")
+
+    async def warm_up(self):
+        """没有密钥或密钥快过期时提前获取,失败时等首个签名请求再获取"""
+        if self._mixin_key is None or self.age >= self.ttl * self.refresh_ratio:
+            await self._background_refresh()
+
+    async def keep_fresh(self, retry_interval: float = 300):
+        """定期刷新密钥,在密钥年龄达到 ttl 的 refresh_ratio 时刷新,需作为后台任务运行
+
+        Args:
+            retry_interval: 获取失败后再次尝试的间隔(秒)
+        """
+        while True:
+            await self.warm_up()
+            if self._mixin_key is None:
+                await asyncio.sleep(retry_interval)
+                continue
+            due = self.ttl * self.refresh_ratio - self.age
+            await asyncio.sleep(due if due > 0 else retry_interval)
+
+    async def get_mixin_key(self) -> str:
+        """获取混合密钥,密钥快过期时触发后台刷新
+
+        Returns:
+            str: 混合密钥
+        """
+        if self._mixin_key is None:
+            await self.refresh()
+        elif self.age >= self.ttl * self.refresh_ratio:
+            self._refresh_in_background()
+        return self._mixin_key
+
+    async def invalidate(self):
+        """签名被拒绝时调用,立即重新获取密钥"""
+        print("WBI签名被拒绝,重新获取密钥")
+        self.fetch_time = 0.0
+        await self.refresh()
@@ -1,13 +1,13 @@
 import os
 import sys
 import requests
-import random
-import time
 from bs4 import BeautifulSoup
 from pathlib import Path
 from typing import Dict, Optional, List
 from services.config_service import ConfigurationService
 from db.models.subtitle import Platform, SubtitleSource
+from services.bili2text.core.http_download import download_file
+from services.bili2text.core.rate_limiter import get_rate_limiter
 from services.bili2text.core.transcriber import AudioTranscriber
 from services.bili2text.core.subtitle_manager import SubtitleManager
 from services.bili2text.core.utils import retry_on_failure
@@ -25,8 +25,6 @@ class XiaoyuzhouAPI:
         # 获取输出目录配置
         self.output_dir = Path(self.config_service.get_config("system", "output_dir"))
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.last_request_time = 0
-        self.request_interval = random.uniform(2, 5)  # 请求间隔2-5秒
         self.headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -127,23 +125,14 @@ class XiaoyuzhouAPI:
             print(error_msg, file=sys.stderr)
             raise
 
-    def _wait_for_next_request(self):
-        """控制请求频率"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.request_interval:
-            sleep_time = self.request_interval - time_since_last_request
-            print(f"等待 {sleep_time:.1f} 秒以控制请求频率...")
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
-
-
     def _extract_episode_info(self, url: str) -> Dict:
         """从播客页面提取信息"""
         try:
-            self._wait_for_next_request()
+            rate_limiter = get_rate_limiter()
+            rate_limiter.acquire_sync("xiaoyuzhou", "episode")
                         
             response = requests.get(url, headers=self.headers, timeout=10)
+            rate_limiter.report("xiaoyuzhou", "episode", response.status_code)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -179,17 +168,20 @@ class XiaoyuzhouAPI:
     def _download_audio(self, audio_url: str, episode_id: str) -> str:
         """下载音频文件"""
         try:
-            self._wait_for_next_request()
+            get_rate_limiter().acquire_sync("xiaoyuzhou", "audio")
             # 构建输出文件路径
             output_path = self.output_dir / f"xiaoyuzhou_{episode_id}.mp3"
             
-            # 下载音频文件
-            response = requests.get(audio_url,headers=self.headers, timeout=30)
-            response.raise_for_status()
-            
-            # 保存音频文件
-            with open(output_path, "wb") as f:
-                f.write(response.content)
+            # 流式写入临时文件,断线后续传,完成后校验大小并原子重命名
+            download_file(
+                audio_url,
+                str(output_path),
+                headers=self.headers,
+                chunk_size=self.config_service.get_config("system", "download_chunk_size") or 1024 * 1024,
+                parallel_parts=self.config_service.get_config("system", "download_parallel_parts") or 1,
+                parallel_threshold=(self.config_service.get_config("system", "download_parallel_threshold_mb") or 64)
+                * 1024 * 1024
+            )
                 
             return str(output_path)
             
@@ -1,17 +1,28 @@
+import copy
 import os
-import random
+import re
 import sys
+import threading
 import time
-from typing import List, Dict, Optional, Any
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
 import pkg_resources
 import yt_dlp
 
+from services.bili2text.core.audio_utils import downloaded_filepath, native_audio_opts
+from services.bili2text.core.rate_limiter import get_rate_limiter
 from services.config_service import ConfigurationService
 
 
 class YoutubeAPI:
+    # 缓存的视频信息条数上限
+    INFO_CACHE_SIZE = 64
+
     def __init__(self):
         self.config_service = ConfigurationService()
+        # 每个视频只提取一次信息,元数据、字幕和音频下载共用
+        self._info_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._info_cache_lock = threading.Lock()
         self._check_dependencies()
         self._set_cookies2yt_dlp()
     
@@ -89,6 +100,59 @@ class YoutubeAPI:
             print(f"从配置初始化YouTube API失败: {str(e)}")
             return None
 
+    @staticmethod
+    def _video_id(url_or_id: str) -> str:
+        """从URL中提取视频ID,本身就是ID时原样返回"""
+        match = re.search(r'(?:v=|youtu\.be/|shorts/)([0-9A-Za-z_-]{11})', url_or_id)
+        return match.group(1) if match else url_or_id
+
+    def _extract_info(self, url: str) -> dict:
+        """调用yt-dlp提取视频信息"""
+        self._set_cookies2yt_dlp()
+        opts = self._get_youtube_opts()
+        try:
+            with self._create_yt_dlp_instance(opts["info_opts"]) as ydl:
+                return ydl.extract_info(url, download=False)
+        except Exception as e:
+            if "SSL" in str(e) or "mount" in str(e):
+                # 如果出现SSL错误或mount错误，尝试使用替代配置
+                alt_opts = opts["info_opts"].copy()
+                alt_opts['downloader'] = 'native'
+                with self._create_yt_dlp_instance(alt_opts) as ydl:
+                    return ydl.extract_info(url, download=False)
+            raise
+
+    def get_info(self, url_or_id: str) -> dict:
+        """获取视频信息,同一视频在 youtube_download.info_cache_ttl 秒内只提取一次
+        
+        格式地址会过期,因此缓存有效期不宜超过数小时
+        
+        Args:
+            url_or_id: 视频URL或视频ID
+            
+        Returns:
+            dict: yt-dlp提取的视频信息,调用方不应修改
+        """
+        video_id = self._video_id(url_or_id)
+        ttl = self.config_service.get_config("youtube_download", "info_cache_ttl") or 0
+        with self._info_cache_lock:
+            cached = self._info_cache.get(video_id)
+            if cached and time.time() - cached[0] < ttl:
+                self._info_cache.move_to_end(video_id)
+                print(f"使用缓存的视频信息: {video_id}")
+                return cached[1]
+
+        # 只有真正调用yt-dlp时才占用视频信息的请求预算
+        get_rate_limiter().acquire_sync("youtube", "video_info")
+        info = self._extract_info(url_or_id)
+        if ttl and info:
+            with self._info_cache_lock:
+                self._info_cache[video_id] = (time.time(), info)
+                self._info_cache.move_to_end(video_id)
+                while len(self._info_cache) > self.INFO_CACHE_SIZE:
+                    self._info_cache.popitem(last=False)
+        return info
+
     def _normalize_language_code(self, lang_code: str) -> Optional[str]:
         """将各种语言代码标准化为 'zh' 或 'en'"""
         lang_code = lang_code.lower().split('-')[0]  # 提取基础语言代码
@@ -105,36 +169,34 @@ class YoutubeAPI:
         """使用yt-dlp获取YouTube字幕"""
         try:
             print(f"尝试获取YouTube字幕: {video_id}")
-            self._set_cookies2yt_dlp()
-            opts = self._get_youtube_opts()
-            with yt_dlp.YoutubeDL(opts["subtitle_opts"]) as ydl:
-                info = ydl.extract_info(video_id, download=False)
-                if not info:
-                    print(f"获取视频信息失败: {video_id}")
-                    return None
-                    
-                subs = info.get('subtitles') or info.get('automatic_captions')
-                if not subs:
-                    print(f"未找到字幕: {video_id}")
-                    return None
-
-                # 对所有可用字幕进行语言代码标准化，并保留最后一个出现的字幕
-                normalized_subs = {}
-                # 保持原始顺序，直接遍历
-                for lang_code in subs.keys():
-                    normalized_lang = self._normalize_language_code(lang_code)
-                    if normalized_lang:
-                        normalized_subs[normalized_lang] = subs[lang_code]
-
-                # 按优先级尝试获取字幕
-                for lang in ['zh', 'en']:
-                    if lang in normalized_subs:
-                        print(f"找到{lang}语言字幕")
-                        sub = normalized_subs[lang][-1]  # 选择最佳格式
-                        return self._download_subtitle(sub['url'])
-
-                print(f"未找到支持的语言字幕: {video_id}")
+            # 字幕轨道地址来自视频信息,与元数据共用一次提取
+            info = self.get_info(video_id)
+            if not info:
+                print(f"获取视频信息失败: {video_id}")
                 return None
+                
+            subs = info.get('subtitles') or info.get('automatic_captions')
+            if not subs:
+                print(f"未找到字幕: {video_id}")
+                return None
+
+            # 对所有可用字幕进行语言代码标准化，并保留最后一个出现的字幕
+            normalized_subs = {}
+            # 保持原始顺序，直接遍历
+            for lang_code in subs.keys():
+                normalized_lang = self._normalize_language_code(lang_code)
+                if normalized_lang:
+                    normalized_subs[normalized_lang] = subs[lang_code]
+
+            # 按优先级尝试获取字幕
+            for lang in ['zh', 'en']:
+                if lang in normalized_subs:
+                    print(f"找到{lang}语言字幕")
+                    sub = normalized_subs[lang][-1]  # 选择最佳格式
+                    return self._download_subtitle(sub['url'])
+
+            print(f"未找到支持的语言字幕: {video_id}")
+            return None
         except Exception as e:
             error_msg = f"获取YouTube字幕失败: {str(e)}"
             print(error_msg, file=sys.stderr)
@@ -158,89 +220,81 @@ class YoutubeAPI:
         """获取视频信息"""
         try:
             print(f"获取视频信息: {url}")
-            self._set_cookies2yt_dlp()
-            opts = self._get_youtube_opts()
-            
-            try:
-                with self._create_yt_dlp_instance(opts["info_opts"]) as ydl:
-                    return ydl.extract_info(url, download=False)
-            except Exception as e:
-                if "SSL" in str(e) or "mount" in str(e):
-                    # 如果出现SSL错误或mount错误，尝试使用替代配置
-                    alt_opts = opts["info_opts"].copy()
-                    alt_opts['downloader'] = 'native'
-                    with self._create_yt_dlp_instance(alt_opts) as ydl:
-                        return ydl.extract_info(url, download=False)
-                raise
-                
+            return self.get_info(url)
         except Exception as e:
             error_msg = f"获取视频信息失败: {str(e)}"
             print(error_msg, file=sys.stderr)
             raise
 
-    def search_videos(self, keyword: str, max_results: int = 200, batch_size: int = 20) -> List[Dict]:
-        """使用yt-dlp分批搜索YouTube视频
+    def iter_search(self, keyword: str, max_results: int = 200, page_size: int = 20) -> Iterator[Dict]:
+        """使用yt-dlp平铺提取分页搜索YouTube视频,边翻页边返回结果
+        
+        搜索结果页按续页令牌依次请求,每页约 page_size 个视频,只解析结果列表而不提取单个视频的信息;
+        结果页是惰性请求的,调用方停止迭代后不会再请求后续页
         
         Args:
             keyword: 搜索关键词
             max_results: 最大结果数量
-            batch_size: 每批次处理的视频数量，默认20个
+            page_size: 每页的视频数量,用于按页限速
             
-        Returns:
-            List[Dict]: 搜索结果列表
+        Yields:
+            Dict: 按搜索排名依次返回的视频,已按ID去重
         """
-        try:
-            print(f"搜索YouTube视频: {keyword}, 目标数量: {max_results}")
-            videos = []
-            remaining = max_results
+        print(f"搜索YouTube视频: {keyword}, 目标数量: {max_results}")
+        opts = self._get_youtube_opts()
+        search_opts = {**opts["info_opts"], 'extract_flat': True}
+        rate_limiter = get_rate_limiter()
+        seen = set()
+        index = 0
 
-            # 在基础配置上添加搜索特有的配置
-            opts = self._get_youtube_opts()
-            search_opts = opts["info_opts"].copy()
-
-            while remaining > 0:
-                current_batch = min(batch_size, remaining)
-                search_url = f"ytsearch{current_batch}:{keyword}"
-
-                print(f"获取下一批次视频，数量: {current_batch}")
-                self._set_cookies2yt_dlp()
-                with yt_dlp.YoutubeDL(search_opts) as ydl:
-                    results = ydl.extract_info(search_url, download=False)
-
-                    if results and 'entries' in results:
-                        batch_videos = []
-                        for entry in results['entries']:
-                            if entry.get('id'):  # 确保有视频ID
-                                batch_videos.append({
-                                    'id': entry.get('id'),
-                                    'title': entry.get('title'),
-                                    'duration': entry.get('duration'),
-                                    'view_count': entry.get('view_count'),
-                                    'uploader': entry.get('uploader'),
-                                    'description': entry.get('description')
-                                })
-
-                        videos.extend(batch_videos)
-                        print(f"本批次成功获取 {len(batch_videos)} 个视频")
-
-                        # 如果本批次获取的视频数量少于预期，说明可能已经没有更多结果
-                        if len(batch_videos) < current_batch:
-                            print("没有更多视频结果")
-                            break
-
-                        remaining -= len(batch_videos)
-
-                        # 批次之间添加延迟，避免频繁请求
-                        if remaining > 0:
-                            delay = random.uniform(10, 20)  # 10-20秒随机延迟
-                            print(f"等待 {delay:.1f} 秒后继续下一批次")
-                            time.sleep(delay)
-                    else:
-                        print("未找到视频结果")
+        try:
+            self._set_cookies2yt_dlp()
+            with yt_dlp.YoutubeDL(search_opts) as ydl:
+                # process=False 时 entries 是惰性生成器,迭代到页尾才请求下一页
+                playlist = ydl.extract_info(f"ytsearchall:{keyword}", download=False, process=False)
+                entries = iter(playlist.get('entries') or [])
+                while len(seen) < max_results:
+                    if index % page_size == 0:
+                        rate_limiter.acquire_sync("youtube", "search")
+                    entry = next(entries, None)
+                    if entry is None:
+                        print("没有更多视频结果")
                         break
+                    index += 1
+
+                    # 翻页期间排名变化会让相邻两页出现重复视频
+                    video_id = entry.get('id')
+                    if not video_id or video_id in seen:
+                        continue
+                    seen.add(video_id)
+                    yield {
+                        'id': video_id,
+                        'title': entry.get('title'),
+                        'duration': entry.get('duration'),
+                        'view_count': entry.get('view_count'),
+                        'uploader': entry.get('uploader') or entry.get('channel'),
+                        'description': entry.get('description')
+                    }
+        except Exception as e:
+            if 'HTTP Error 429' in str(e):
+                rate_limiter.report("youtube", "search", 429)
+            raise
 
-            print(f"搜索完成，共找到 {len(videos)} 个视频")
-            return videos
+        print(f"搜索完成，共找到 {len(seen)} 个视频 (请求 {-(-index // page_size)} 页)")
+
+    def search_videos(self, keyword: str, max_results: int = 200, page_size: int = 20) -> List[Dict]:
+        """使用yt-dlp分页搜索YouTube视频
+        
+        Args:
+            keyword: 搜索关键词
+            max_results: 最大结果数量
+            page_size: 每页的视频数量，默认20个
+            
+        Returns:
+            List[Dict]: 搜索结果列表
+        """
+        try:
+            return list(self.iter_search(keyword, max_results, page_size))
 
         except Exception as e:
             error_msg = f"YouTube搜索失败: {str(e)}"
@@ -251,23 +305,31 @@ class YoutubeAPI:
         """下载音频"""
         try:
             opts = self._get_youtube_opts()
+            audio_opts = opts["audio_opts"]
             base_path = output_path.replace('.mp3', '')
-            opts["audio_opts"]["outtmpl"] = f'{base_path}.%(ext)s'
+            native_audio = self.config_service.get_config("system", "keep_native_audio")
+            if native_audio:
+                # 保留原始音频流,由转写器直接解码,省去转码为mp3的步骤
+                audio_opts = native_audio_opts(audio_opts)
+            audio_opts["outtmpl"] = f'{base_path}.%(ext)s'
             print(f"开始下载音频: {url}")
             self._set_cookies2yt_dlp()
 
+            # 复用已提取的视频信息,只按音频选项重新选择格式并下载
+            cached_info = self.get_info(url)
+
             try:
-                with self._create_yt_dlp_instance(opts["audio_opts"]) as ydl:
-                    ydl.extract_info(url, download=True)
-                    return output_path
+                with self._create_yt_dlp_instance(audio_opts) as ydl:
+                    info = ydl.process_ie_result(copy.deepcopy(cached_info), download=True)
+                    return downloaded_filepath(info, output_path) if native_audio else output_path
             except Exception as e:
                 if "SSL" in str(e) or "mount" in str(e):
                     # 如果出现SSL错误或mount错误，尝试使用替代配置
-                    alt_opts = opts["audio_opts"].copy()
+                    alt_opts = audio_opts.copy()
                     alt_opts['downloader'] = 'native'
                     with self._create_yt_dlp_instance(alt_opts) as ydl:
-                        ydl.extract_info(url, download=True)
-                        return output_path
+                        info = ydl.process_ie_result(copy.deepcopy(cached_info), download=True)
+                        return downloaded_filepath(info, output_path) if native_audio else output_path
                 raise
                 
         except Exception as e: